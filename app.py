@@ -8,30 +8,133 @@ Two-tab interface:
 
 import gradio as gr
 import pandas as pd
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, Iterator, List
 import os
+import re
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import ollama
 
-from database import init_db, add_report, get_report, get_all_reports, delete_report, get_report_count_by_source
-from rag_engine import RAGEngine
-from report_generator import ReportGenerator
-from philter_runner import deidentify_text
+from database import init_db, add_report, get_report, get_all_reports_summary, delete_report, get_report_count_by_source
+from rag_engine import RAGEngine, BatchIndexer, get_shared_rag_engine
+from report_generator import ReportGenerator, KEEP_ALIVE
+from philter_runner import deidentify_text_cached
 from ocr_engine import OCREngine
 from export_report import export_to_docx
+from lru_cache import LRUCache, hash_key
 
 # Initialize components
 print("Initializing database...")
 init_db()
 
-print("Initializing RAG engine...")
-rag_engine = RAGEngine()
 
-print("Initializing Report Generator...")
-report_gen = ReportGenerator(rag_engine=rag_engine)
+# Heavy components are created on first use so startup stays fast and a tab
+# that is never exercised doesn't hold its models in memory
+_components: Dict[str, Any] = {}
+# One lock per component, so a slow factory (e.g. loading the embedding
+# model) doesn't block callers of unrelated components
+_component_locks: Dict[str, threading.Lock] = {}
+_component_locks_lock = threading.Lock()
 
-print("Initializing OCR engine...")
-ocr_engine = OCREngine()
+
+def _get_component(name: str, factory):
+    """Return the named component, creating it once even under concurrent calls."""
+    component = _components.get(name)
+    if component is not None:
+        return component
+
+    with _component_locks_lock:
+        lock = _component_locks.setdefault(name, threading.Lock())
+    with lock:
+        if name not in _components:
+            print(f"Initializing {name}...")
+            _components[name] = factory()
+        return _components[name]
+
+
+def _peek_component(name: str) -> Optional[Any]:
+    """Return the named component if it has been created, without creating it."""
+    return _components.get(name)
+
+
+def get_rag_engine() -> RAGEngine:
+    """Get the shared RAG engine, creating it on first use."""
+    return _get_component("RAG engine", get_shared_rag_engine)
+
+
+def get_rag_indexer() -> BatchIndexer:
+    """Get the shared background indexer for newly added reports."""
+    return _get_component("RAG indexer", lambda: BatchIndexer(get_rag_engine()))
+
+
+def get_report_generator() -> ReportGenerator:
+    """Get the shared report generator, creating it on first use."""
+    return _get_component("Report Generator", lambda: ReportGenerator(rag_engine=get_rag_engine()))
+
+
+def get_ocr_engine() -> OCREngine:
+    """Get the shared OCR engine, creating it on first use."""
+    return _get_component("OCR engine", OCREngine)
+
+
+def prefetch_components() -> None:
+    """Warm the lazy components and LLMs in the background so first clicks stay fast."""
+    get_rag_engine().warm_up()
+    get_report_generator().warm_up()
+    get_ocr_engine()
+    try:
+        # Same context size as extraction requests, so they don't reload the model
+        ollama.generate(
+            model=EXTRACTION_MODEL,
+            prompt="",
+            options={"num_ctx": EXTRACTION_NUM_CTX},
+            keep_alive=KEEP_ALIVE
+        )
+    except Exception as e:
+        print(f"Warning: could not preload {EXTRACTION_MODEL} - {str(e)}")
+
+
+# Ollama model for brief op note field extraction. Schema-constrained JSON field
+# filling doesn't need the 32B generator; a 4-bit 7B decodes several times faster.
+EXTRACTION_MODEL = "qwen2.5:7b-instruct-q4_K_M"
+# Prompt + brief note fit easily; a smaller KV cache than the generator's
+EXTRACTION_NUM_CTX = 4096
+
+# Concurrent LLM-bound events Gradio hands to Ollama at once. Ollama batches
+# concurrent requests on the GPU when started with OLLAMA_NUM_PARALLEL >= this.
+QUEUE_CONCURRENCY = 4
+QUEUE_MAX_SIZE = 64
+
+# Ingest runs OCR over HTTP and Philter in a subprocess, so neither holds the
+# GIL; let more ingests overlap on Gradio's worker threads
+INGEST_CONCURRENCY = 8
+
+# Fields extracted from a brief op note, in form order
+EXTRACTION_FIELDS = [
+    "procedure_type", "preop_diagnosis", "postop_diagnosis", "surgeon_name", "assistant",
+    "anesthesia_type", "indications", "findings", "procedure_details", "specimens",
+    "drains", "ebl", "complications"
+]
+
+# Field groups extracted by parallel LLM calls, with each call's token budget.
+# Each call decodes only a few fields, and Ollama batches the concurrent
+# requests, so latency tracks the slowest group rather than the whole object.
+# The narrative group needs room for free text, or its JSON gets truncated.
+EXTRACTION_GROUPS = [
+    (["procedure_type", "preop_diagnosis", "postop_diagnosis", "indications"], 256),
+    (["surgeon_name", "assistant", "anesthesia_type", "specimens", "drains", "ebl", "complications"], 256),
+    (["findings", "procedure_details"], 1024),
+]
+
+# Extracted fields keyed by SHA-256 of the raw note text
+extraction_cache = LRUCache(maxsize=256)
+
+# Header patterns for auto-extracting procedure type (compiled once)
+PROCEDURE_PATTERNS = [
+    re.compile(r'(?:OPERATIVE\s+)?PROCEDURE(?:\s+PERFORMED)?[:\s]+([^\n]+)', re.IGNORECASE),
+    re.compile(r'OPERATION(?:\s+PERFORMED)?[:\s]+([^\n]+)', re.IGNORECASE),
+]
 
 # Specialty options
 SPECIALTY_OPTIONS = [
@@ -92,7 +195,7 @@ def process_and_add_report(
         if uploaded_file is not None:
             # File uploaded - use OCR
             file_path = uploaded_file.name if hasattr(uploaded_file, 'name') else uploaded_file
-            ocr_result = ocr_engine.process_file(file_path)
+            ocr_result = get_ocr_engine().process_file_cached(file_path)
 
             if ocr_result.startswith("Error:"):
                 return ocr_result, "", f"OCR failed: {ocr_result}"
@@ -105,7 +208,7 @@ def process_and_add_report(
             return "", "", "Error: Please paste text or upload a file."
 
         # De-identify with Philter
-        deid_text = deidentify_text(raw_text)
+        deid_text = deidentify_text_cached(raw_text)
 
         if deid_text.startswith("Error:"):
             return ocr_result, deid_text, f"De-identification failed: {deid_text}"
@@ -125,8 +228,8 @@ def process_and_add_report(
             is_deidentified=True
         )
 
-        # Add to RAG index
-        rag_engine.add_single_report(
+        # Queue for batched RAG indexing
+        get_rag_indexer().submit(
             report_id=report_id,
             report_text=deid_text,
             procedure_type=procedure_type,
@@ -134,6 +237,10 @@ def process_and_add_report(
         )
 
         status = f"✓ Report added successfully! ID: {report_id}"
+        failed = get_rag_indexer().failed_reports()
+        if failed:
+            status += (f"\n⚠ {len(failed)} report(s) failed to index for search. "
+                       "Refresh Database View to retry.")
         return ocr_result, deid_text, status
 
     except Exception as e:
@@ -142,43 +249,46 @@ def process_and_add_report(
 
 def extract_procedure_type(text: str) -> str:
     """Extract procedure type from report text."""
-    import re
-    patterns = [
-        r'(?:OPERATIVE\s+)?PROCEDURE(?:\s+PERFORMED)?[:\s]+([^\n]+)',
-        r'OPERATION(?:\s+PERFORMED)?[:\s]+([^\n]+)',
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+    for pattern in PROCEDURE_PATTERNS:
+        match = pattern.search(text)
         if match:
-            proc = match.group(1).strip()
-            proc = proc.replace('**', '').strip()
-            if len(proc) > 100:
-                proc = proc[:100] + "..."
-            return proc
+            proc = match.group(1).replace('**', '').strip()
+            return proc[:100] + ("..." if len(proc) > 100 else "")
     return "Unknown Procedure"
 
 
 def refresh_database_view() -> Tuple[pd.DataFrame, str]:
-    """Get all reports and database stats."""
-    reports = get_all_reports(limit=500)
+    """Get all reports and database stats, retrying any failed RAG indexing."""
+    # Nothing can have failed to index if no report was submitted, so don't
+    # create the indexer (and load the embedding model) just to check
+    failed = {}
+    indexer = _peek_component("RAG indexer")
+    if indexer is not None:
+        if indexer.retry_failed():
+            indexer.flush()
+        failed = indexer.failed_reports()
+
+    reports = get_all_reports_summary(limit=500)
 
     if not reports:
         return pd.DataFrame(), "Database is empty."
 
-    # Build dataframe
-    data = []
-    for r in reports:
-        preview = r.get('report_text', '')[:80] + "..." if len(r.get('report_text', '')) > 80 else r.get('report_text', '')
-        data.append({
-            'ID': r.get('id'),
-            'Procedure Type': r.get('procedure_type', '')[:50],
-            'Specialty': r.get('specialty', ''),
-            'Source': r.get('source', ''),
-            'Added': str(r.get('added_at', ''))[:19],
-            'Preview': preview
-        })
-
-    df = pd.DataFrame(data)
+    # Build dataframe with vectorized column ops
+    raw = pd.DataFrame.from_records(
+        reports,
+        columns=['id', 'procedure_type', 'specialty', 'source', 'added_at', 'preview']
+    )
+    text = raw['preview'].fillna('')
+    preview = text.str.slice(0, 80)
+
+    df = pd.DataFrame({
+        'ID': raw['id'],
+        'Procedure Type': raw['procedure_type'].fillna('').str.slice(0, 50),
+        'Specialty': raw['specialty'].fillna(''),
+        'Source': raw['source'].fillna(''),
+        'Added': raw['added_at'].astype(str).str.slice(0, 19),
+        'Preview': preview.where(text.str.len() <= 80, preview + "...")
+    })
 
     # Get stats
     stats = get_report_count_by_source()
@@ -186,6 +296,10 @@ def refresh_database_view() -> Tuple[pd.DataFrame, str]:
     stats_text = f"Total Reports: {total}\n"
     for source, count in stats.items():
         stats_text += f"  - {source}: {count}\n"
+    if failed:
+        stats_text += f"Not indexed for search (retry failed): {len(failed)}\n"
+        for report_id, error in sorted(failed.items()):
+            stats_text += f"  - ID {report_id}: {error}\n"
 
     return df, stats_text
 
@@ -212,8 +326,12 @@ def delete_report_handler(report_id: int) -> str:
     deleted = delete_report(report_id)
 
     if deleted:
-        # Delete from RAG index
-        rag_engine.delete_report(report_id)
+        # Delete from RAG index, after any pending adds so it can't be re-added
+        indexer = _peek_component("RAG indexer")
+        if indexer is not None:
+            indexer.flush()
+            indexer.forget(report_id)
+        get_rag_engine().delete_report(report_id)
         return f"✓ Report ID {report_id} deleted successfully."
     else:
         return f"Report ID {report_id} not found."
@@ -221,14 +339,65 @@ def delete_report_handler(report_id: int) -> str:
 
 # ============== TAB 2 FUNCTIONS ==============
 
+def _extract_field_group(deid_text: str, fields: List[str], num_predict: int) -> Dict[str, str]:
+    """
+    Extract one group of fields from a de-identified brief op note.
+
+    Args:
+        deid_text: De-identified note text
+        fields: Field names to extract
+        num_predict: Maximum tokens to generate for this group
+
+    Returns:
+        Dict mapping each field name to its extracted value
+    """
+    extraction_prompt = f"""Extract the following fields from this brief operative note.
+Return ONLY a valid JSON object with these keys:
+{", ".join(fields)}.
+
+If a field is not mentioned, use an empty string for that field.
+
+Brief Operative Note:
+"""
+    extraction_prompt += deid_text
+
+    # format=schema constrains decoding to schema-valid JSON
+    response = ollama.chat(
+        model=EXTRACTION_MODEL,
+        messages=[
+            {"role": "system", "content": "You are a medical data extraction assistant. Extract structured information from operative notes and return valid JSON only."},
+            {"role": "user", "content": extraction_prompt}
+        ],
+        format={
+            "type": "object",
+            "properties": {key: {"type": "string"} for key in fields},
+            "required": fields,
+        },
+        keep_alive=KEEP_ALIVE,
+        options={
+            "temperature": 0.1,  # Low temperature for consistent extraction
+            "num_predict": num_predict,
+            "num_ctx": EXTRACTION_NUM_CTX,
+        }
+    )
+
+    extracted = json.loads(response['message']['content'].strip())
+    return {key: extracted.get(key, "") for key in fields}
+
+
 def extract_from_brief_note(
     pasted_text: str,
     uploaded_file
-) -> Tuple[str, str, str, str, str, str, str, str, str, str, str, str, str, str]:
+) -> Iterator[Tuple[Any, ...]]:
     """
     Extract structured data from a brief operative note and return field values.
 
-    Returns tuple of:
+    Field groups are extracted in parallel; as each finishes, its fields are
+    filled in while the rest are left untouched. A group that fails leaves
+    its fields untouched and is named in the status message; the other
+    groups' fields are kept.
+
+    Yields tuples of:
     (procedure_type, preop_diagnosis, postop_diagnosis, surgeon_name, assistant,
      anesthesia_type, indications, findings, procedure_details, specimens,
      drains, ebl, complications, status_message)
@@ -241,84 +410,63 @@ def extract_from_brief_note(
         if uploaded_file is not None:
             # File uploaded - try OCR
             file_path = uploaded_file.name if hasattr(uploaded_file, 'name') else uploaded_file
-            ocr_result = ocr_engine.process_file(file_path)
+            ocr_result = get_ocr_engine().process_file_cached(file_path)
 
             if ocr_result.startswith("Error:"):
                 # OCR failed - likely model not installed
-                return empty_result[:-1] + ("OCR model not yet available. Please paste the text instead.",)
+                yield empty_result[:-1] + ("OCR model not yet available. Please paste the text instead.",)
+                return
 
             raw_text = ocr_result
         elif pasted_text and pasted_text.strip():
             raw_text = pasted_text.strip()
         else:
-            return empty_result[:-1] + ("Please paste text or upload a file.",)
+            yield empty_result[:-1] + ("Please paste text or upload a file.",)
+            return
+
+        # Skip Philter and the LLM entirely if this exact note was already extracted
+        cache_key = hash_key(raw_text)
+        cached = extraction_cache.get(cache_key)
+        if cached is not None:
+            yield cached + ("Fields extracted successfully (cached). Review and edit as needed.",)
+            return
 
         # De-identify with Philter
-        deid_text = deidentify_text(raw_text)
+        deid_text = deidentify_text_cached(raw_text)
 
         if deid_text.startswith("Error:"):
-            return empty_result[:-1] + (f"De-identification failed: {deid_text}",)
-
-        # Build extraction prompt
-        extraction_prompt = """Extract the following fields from this brief operative note.
-Return ONLY a valid JSON object with these keys:
-procedure_type, preop_diagnosis, postop_diagnosis, surgeon_name, assistant,
-anesthesia_type, indications, findings, procedure_details, specimens,
-drains, ebl, complications.
+            yield empty_result[:-1] + (f"De-identification failed: {deid_text}",)
+            return
+
+        # Extract field groups in parallel, filling the form as each completes
+        extracted = {}
+        failures = []
+        with ThreadPoolExecutor(max_workers=len(EXTRACTION_GROUPS)) as pool:
+            futures = {
+                pool.submit(_extract_field_group, deid_text, group, num_predict): group
+                for group, num_predict in EXTRACTION_GROUPS
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    extracted.update(future.result())
+                except json.JSONDecodeError as e:
+                    failures.append(f"{', '.join(futures[future])} (invalid JSON: {str(e)})")
+                except Exception as e:
+                    failures.append(f"{', '.join(futures[future])} ({str(e)})")
+                partial = tuple(extracted[key] if key in extracted else gr.update() for key in EXTRACTION_FIELDS)
+                yield partial + (f"Extracting fields... ({done}/{len(futures)} groups done)",)
 
-If a field is not mentioned, use an empty string for that field.
+        if failures:
+            yield partial + ("Some fields could not be extracted: " + "; ".join(failures) + ". Review and fill them in.",)
+            return
 
-Brief Operative Note:
-"""
-        extraction_prompt += deid_text
-
-        # Call Ollama to extract fields
-        response = ollama.chat(
-            model="qwen2.5:32b",
-            messages=[
-                {"role": "system", "content": "You are a medical data extraction assistant. Extract structured information from operative notes and return valid JSON only."},
-                {"role": "user", "content": extraction_prompt}
-            ],
-            options={
-                "temperature": 0.1,  # Low temperature for consistent extraction
-                "num_predict": 1024,
-            }
-        )
+        fields = tuple(extracted.get(key, "") for key in EXTRACTION_FIELDS)
+        extraction_cache.set(cache_key, fields)
 
-        response_text = response['message']['content']
-
-        # Try to parse JSON from response
-        # Handle cases where model might wrap JSON in markdown code blocks
-        json_text = response_text
-        if "```json" in json_text:
-            json_text = json_text.split("```json")[1].split("```")[0]
-        elif "```" in json_text:
-            json_text = json_text.split("```")[1].split("```")[0]
-
-        extracted = json.loads(json_text.strip())
-
-        # Return extracted values in order
-        return (
-            extracted.get("procedure_type", ""),
-            extracted.get("preop_diagnosis", ""),
-            extracted.get("postop_diagnosis", ""),
-            extracted.get("surgeon_name", ""),
-            extracted.get("assistant", ""),
-            extracted.get("anesthesia_type", ""),
-            extracted.get("indications", ""),
-            extracted.get("findings", ""),
-            extracted.get("procedure_details", ""),
-            extracted.get("specimens", ""),
-            extracted.get("drains", ""),
-            extracted.get("ebl", ""),
-            extracted.get("complications", ""),
-            "Fields extracted successfully. Review and edit as needed."
-        )
+        yield fields + ("Fields extracted successfully. Review and edit as needed.",)
 
-    except json.JSONDecodeError as e:
-        return empty_result[:-1] + (f"Failed to parse extraction response as JSON: {str(e)}",)
     except Exception as e:
-        return empty_result[:-1] + (f"Error extracting fields: {str(e)}",)
+        yield empty_result[:-1] + (f"Error extracting fields: {str(e)}",)
 
 
 def generate_report_handler(
@@ -334,31 +482,47 @@ def generate_report_handler(
     specimens: str,
     drains: str,
     ebl: str,
-    complications: str
-) -> str:
-    """Generate an operative report from inputs."""
+    complications: str,
+    force_refresh: bool = False
+) -> Iterator[str]:
+    """
+    Generate an operative report from inputs, streaming text as it is produced.
+
+    The generator returns a recent report for an identical prompt unless
+    force_refresh is set.
+    """
     if not procedure_type or not preop_diagnosis or not surgeon:
-        return "Error: Please fill in at least Procedure Type, Preop Diagnosis, and Surgeon."
+        yield "Error: Please fill in at least Procedure Type, Preop Diagnosis, and Surgeon."
+        return
+
+    inputs = {
+        "procedure_type": procedure_type,
+        "preop_diagnosis": preop_diagnosis,
+        "postop_diagnosis": postop_diagnosis or preop_diagnosis,
+        "surgeon_name": surgeon,
+        "assistant": assistant or "",
+        "anesthesia_type": anesthesia or "",
+        "indications": indications or "",
+        "findings": findings or "",
+        "procedure_details": procedure_details or "",
+        "specimens": specimens or "None",
+        "drains": drains or "None",
+        "ebl": ebl or "Minimal",
+        "complications": complications or "None",
+    }
+    inputs = {key: value.strip() for key, value in inputs.items()}
 
     try:
-        report = report_gen.generate_report(
-            procedure_type=procedure_type,
-            preop_diagnosis=preop_diagnosis,
-            postop_diagnosis=postop_diagnosis or preop_diagnosis,
-            surgeon_name=surgeon,
-            assistant=assistant or "",
-            anesthesia_type=anesthesia,
-            indications=indications or "",
-            findings=findings or "",
-            procedure_details=procedure_details or "",
-            specimens=specimens or "None",
-            drains=drains or "None",
-            ebl=ebl or "Minimal",
-            complications=complications or "None"
-        )
-        return report
+        generator = get_report_generator()
+        for report in generator.generate_report_stream(**inputs, force_refresh=force_refresh):
+            yield report
     except Exception as e:
-        return f"Error generating report: {str(e)}"
+        yield f"Error generating report: {str(e)}"
+
+
+def regenerate_report_handler(*fields: str) -> Iterator[str]:
+    """Generate a fresh draft for the same inputs, bypassing the report cache."""
+    yield from generate_report_handler(*fields, force_refresh=True)
 
 
 def export_report_handler(report_text: str) -> Optional[str]:
@@ -451,7 +615,8 @@ with gr.Blocks(title="Operative Report Generator", css=brand_css) as app:
             add_btn.click(
                 fn=process_and_add_report,
                 inputs=[paste_input, file_input, procedure_input, specialty_input],
-                outputs=[ocr_output, deid_output, status_output]
+                outputs=[ocr_output, deid_output, status_output],
+                concurrency_limit=INGEST_CONCURRENCY
             )
 
             # Database Management Section
@@ -583,7 +748,9 @@ with gr.Blocks(title="Operative Report Generator", css=brand_css) as app:
                         gen_ebl = gr.Textbox(label="EBL", value="Minimal")
                         gen_complications = gr.Textbox(label="Complications", value="None")
 
-                    generate_btn = gr.Button("Generate Report", variant="primary", size="lg")
+                    with gr.Row():
+                        generate_btn = gr.Button("Generate Report", variant="primary", size="lg")
+                        regenerate_btn = gr.Button("Regenerate", size="lg")
 
                 # Right column - output
                 with gr.Column(scale=1):
@@ -596,15 +763,21 @@ with gr.Blocks(title="Operative Report Generator", css=brand_css) as app:
                     export_btn = gr.Button("Export to Word (.docx)")
                     export_file = gr.File(label="Download Report")
 
-            # Wire up generate button
+            # Wire up generate and regenerate buttons
+            generate_inputs = [
+                gen_procedure, gen_preop, gen_postop,
+                gen_surgeon, gen_assistant, gen_anesthesia,
+                gen_indications, gen_findings, gen_details,
+                gen_specimens, gen_drains, gen_ebl, gen_complications
+            ]
             generate_btn.click(
                 fn=generate_report_handler,
-                inputs=[
-                    gen_procedure, gen_preop, gen_postop,
-                    gen_surgeon, gen_assistant, gen_anesthesia,
-                    gen_indications, gen_findings, gen_details,
-                    gen_specimens, gen_drains, gen_ebl, gen_complications
-                ],
+                inputs=generate_inputs,
+                outputs=[generated_report]
+            )
+            regenerate_btn.click(
+                fn=regenerate_report_handler,
+                inputs=generate_inputs,
                 outputs=[generated_report]
             )
 
@@ -628,9 +801,14 @@ with gr.Blocks(title="Operative Report Generator", css=brand_css) as app:
                 ]
             )
 
+# Let concurrent users' requests reach Ollama together so they can be batched
+app.queue(default_concurrency_limit=QUEUE_CONCURRENCY, max_size=QUEUE_MAX_SIZE)
+
 
 # Launch app
 if __name__ == "__main__":
+    threading.Thread(target=prefetch_components, daemon=True).start()
+
     print("\nStarting Gradio app...")
     app.launch(
         server_name="0.0.0.0",
@@ -4,9 +4,9 @@ Bulk Import - Process files from own_reports/raw/ and import into the database.
 Workflow:
 1. Scan own_reports/raw/ for supported file types
 2. Extract text (direct read for .txt, OCR for images/PDFs)
-3. De-identify using Philter
-4. Save de-identified version to own_reports/deid/
-5. Import into reports.db
+3. De-identify all extracted texts with a single Philter run
+4. Save de-identified version to own_reports/deid/ (if SAVE_DEID_COPY)
+5. Import into reports.db (all files in one transaction)
 6. Add to ChromaDB for RAG
 7. Move original to own_reports/imported/
 """
@@ -14,14 +14,17 @@ Workflow:
 import os
 import re
 import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Tuple, Dict, List
+from typing import Optional, Tuple, Dict, List, Set, TYPE_CHECKING
 
-from ocr_engine import OCREngine
-from philter_runner import deidentify_text
-from database import init_db, add_report
-from rag_engine import RAGEngine
+from philter_runner import deidentify_batch
+from database import init_db, add_reports_bulk
+
+if TYPE_CHECKING:
+    from ocr_engine import OCREngine
+    from rag_engine import RAGEngine
 
 # Directories
 RAW_DIR = Path("own_reports/raw")
@@ -37,6 +40,51 @@ ALL_EXTENSIONS = TEXT_EXTENSIONS | OCR_EXTENSIONS
 SOURCE = "Own Clinical - Philter De-identified"
 DEFAULT_SPECIALTY = "Surgery"
 
+# Keep a copy of each de-identified report in DEID_DIR. Nothing in the import
+# reads these back; disable to skip the disk writes.
+SAVE_DEID_COPY = True
+
+# Reports per ChromaDB add() call when indexing imported reports
+RAG_BATCH_SIZE = 100
+
+# Files extracted concurrently. OCR is an HTTP call to Ollama, so threads
+# overlap the requests without GIL contention.
+EXTRACT_WORKERS = 4
+
+# Header patterns for procedure type, in priority order (compiled once)
+PROCEDURE_PATTERNS = [
+    re.compile(r'(?:OPERATIVE\s+)?PROCEDURE(?:\s+PERFORMED)?[:\s]+([^\n]+)', re.IGNORECASE),
+    re.compile(r'OPERATION(?:\s+PERFORMED)?[:\s]+([^\n]+)', re.IGNORECASE),
+    re.compile(r'SURGERY[:\s]+([^\n]+)', re.IGNORECASE),
+    re.compile(r'POSTOPERATIVE\s+DIAGNOSIS[:\s]+([^\n]+)', re.IGNORECASE),
+]
+EDGE_PUNCTUATION = re.compile(r'^[,\s]+|[,\s]+$')
+
+# Common specialty indicators, in priority order
+SPECIALTY_KEYWORDS = {
+    'gastroenterology': ['gastro', 'endoscopy', 'colonoscopy', 'egd', 'ercp'],
+    'orthopedic surgery': ['orthopedic', 'arthroplasty', 'fracture', 'joint'],
+    'cardiothoracic surgery': ['cardiothoracic', 'cabg', 'cardiac', 'thoracotomy'],
+    'neurosurgery': ['neurosurg', 'craniotomy', 'laminectomy', 'spine'],
+    'urology': ['urolog', 'cystoscopy', 'prostatectomy', 'nephrectomy'],
+    'gynecology': ['gynecolog', 'hysterectomy', 'oophorectomy'],
+    'general surgery': ['appendectomy', 'cholecystectomy', 'hernia', 'laparoscopic'],
+}
+SPECIALTY_NAMES = list(SPECIALTY_KEYWORDS)
+KEYWORD_RANK = {
+    keyword: rank
+    for rank, keywords in enumerate(SPECIALTY_KEYWORDS.values())
+    for keyword in keywords
+}
+# One alternation over all keywords, in priority order. The lookahead makes
+# matches zero-width so overlapping keywords are all seen in a single scan.
+# ASCII-only case folding, so every match lowercases to a KEYWORD_RANK key
+# (Unicode folding would let e.g. "ſ" match "s").
+SPECIALTY_PATTERN = re.compile(
+    '(?=(' + '|'.join(re.escape(keyword) for keyword in KEYWORD_RANK) + '))',
+    re.IGNORECASE | re.ASCII
+)
+
 
 def ensure_directories():
     """Create required directories if they don't exist."""
@@ -56,21 +104,12 @@ def extract_procedure_type(text: str) -> str:
 
     Returns extracted procedure type or 'Unknown Procedure'
     """
-    # Patterns to look for procedure type
-    patterns = [
-        r'(?:OPERATIVE\s+)?PROCEDURE(?:\s+PERFORMED)?[:\s]+([^\n]+)',
-        r'OPERATION(?:\s+PERFORMED)?[:\s]+([^\n]+)',
-        r'SURGERY[:\s]+([^\n]+)',
-        r'POSTOPERATIVE\s+DIAGNOSIS[:\s]+([^\n]+)',
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+    for pattern in PROCEDURE_PATTERNS:
+        match = pattern.search(text)
         if match:
             procedure = match.group(1).strip()
-            # Clean up the procedure text
-            procedure = re.sub(r'^[,\s]+', '', procedure)  # Remove leading commas/spaces
-            procedure = re.sub(r'[,\s]+$', '', procedure)  # Remove trailing commas/spaces
+            # Clean up the procedure text: strip leading/trailing commas and spaces
+            procedure = EDGE_PUNCTUATION.sub('', procedure)
             # Truncate if too long
             if len(procedure) > 200:
                 procedure = procedure[:200] + "..."
@@ -84,64 +123,71 @@ def extract_specialty(text: str) -> str:
     """
     Try to extract medical specialty from report text.
 
+    Scans the text once for every specialty keyword; when several
+    specialties match, the earliest in SPECIALTY_KEYWORDS wins.
+
     Returns extracted specialty or default.
     """
-    # Common specialty indicators
-    specialties = {
-        'gastroenterology': ['gastro', 'endoscopy', 'colonoscopy', 'egd', 'ercp'],
-        'orthopedic surgery': ['orthopedic', 'arthroplasty', 'fracture', 'joint'],
-        'cardiothoracic surgery': ['cardiothoracic', 'cabg', 'cardiac', 'thoracotomy'],
-        'neurosurgery': ['neurosurg', 'craniotomy', 'laminectomy', 'spine'],
-        'urology': ['urolog', 'cystoscopy', 'prostatectomy', 'nephrectomy'],
-        'gynecology': ['gynecolog', 'hysterectomy', 'oophorectomy'],
-        'general surgery': ['appendectomy', 'cholecystectomy', 'hernia', 'laparoscopic'],
-    }
-
-    text_lower = text.lower()
-    for specialty, keywords in specialties.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                return specialty.title()
+    best_rank = None
+    for match in SPECIALTY_PATTERN.finditer(text):
+        rank = KEYWORD_RANK[match.group(1).lower()]
+        if best_rank is None or rank < best_rank:
+            best_rank = rank
+            if rank == 0:
+                break
 
-    return DEFAULT_SPECIALTY
+    if best_rank is None:
+        return DEFAULT_SPECIALTY
+    return SPECIALTY_NAMES[best_rank].title()
 
 
 def read_text_file(file_path: Path) -> Tuple[str, Optional[str]]:
     """
     Read text from a .txt file.
 
+    The file is read once as bytes; the latin-1 fallback decodes the same
+    buffer instead of reopening the file.
+
     Returns (text, error_message)
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read(), None
-    except UnicodeDecodeError:
-        try:
-            with open(file_path, 'r', encoding='latin-1') as f:
-                return f.read(), None
-        except Exception as e:
-            return "", f"Failed to read file: {e}"
+        data = file_path.read_bytes()
     except Exception as e:
         return "", f"Failed to read file: {e}"
 
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError:
+        # latin-1 maps every byte, so this cannot fail
+        text = data.decode('latin-1')
+
+    # Match text-mode reads, which translate \r\n and \r to \n
+    return text.replace('\r\n', '\n').replace('\r', '\n'), None
+
 
 def process_file(
     file_path: Path,
-    ocr_engine: OCREngine,
-    rag_engine: RAGEngine
+    ocr_engine: 'OCREngine'
 ) -> Dict:
     """
-    Process a single file through the import pipeline.
+    Extract the text of a single file (phase 1 of the import).
+
+    On success the result has status 'extracted' and carries the raw
+    text for deidentify_extracted().
 
     Returns a dict with processing results.
     """
     result = {
         'filename': file_path.name,
+        'file_path': file_path,
         'file_type': file_path.suffix.lower(),
         'status': 'pending',
         'error': None,
         'report_id': None,
         'procedure_type': None,
+        'specialty': None,
+        'raw_text': None,
+        'deid_text': None,
     }
 
     try:
@@ -171,60 +217,153 @@ def process_file(
             result['error'] = "Extracted text too short or empty"
             return result
 
-        # Step 2: De-identify with Philter
-        deid_text = deidentify_text(raw_text)
+        result['raw_text'] = raw_text
+        result['status'] = 'extracted'
+
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)
+
+    return result
+
+
+def deidentify_extracted(results: List[Dict]) -> None:
+    """
+    De-identify all 'extracted' results with one Philter run (phase 2).
+
+    Saves the de-identified copies and extracts metadata; each result
+    becomes 'ready' for import_ready_reports() or 'failed'. Updates the
+    results in place.
+    """
+    extracted = [r for r in results if r['status'] == 'extracted']
+    if not extracted:
+        return
+
+    # Step 2: De-identify with Philter
+    deid_texts = deidentify_batch([r['raw_text'] for r in extracted])
+
+    for r, deid_text in zip(extracted, deid_texts):
+        r['raw_text'] = None
         if deid_text.startswith("Error:"):
-            result['status'] = 'failed'
-            result['error'] = f"De-identification failed: {deid_text}"
-            return result
+            r['status'] = 'failed'
+            r['error'] = f"De-identification failed: {deid_text}"
+            continue
+
+        try:
+            # Step 3: Save de-identified version (downstream steps use the in-memory text)
+            if SAVE_DEID_COPY:
+                deid_path = DEID_DIR / (r['file_path'].stem + ".txt")
+                deid_path.write_bytes(deid_text.encode('utf-8'))
+
+            # Step 4: Extract metadata
+            r['procedure_type'] = extract_procedure_type(deid_text)
+            r['specialty'] = extract_specialty(deid_text)
+            r['deid_text'] = deid_text
+
+            r['status'] = 'ready'
+
+        except Exception as e:
+            r['status'] = 'failed'
+            r['error'] = str(e)
 
-        # Step 3: Save de-identified version
-        deid_filename = file_path.stem + ".txt"
-        deid_path = DEID_DIR / deid_filename
-        with open(deid_path, 'w', encoding='utf-8') as f:
-            f.write(deid_text)
-
-        # Step 4: Extract metadata
-        procedure_type = extract_procedure_type(deid_text)
-        specialty = extract_specialty(deid_text)
-        result['procedure_type'] = procedure_type
-
-        # Step 5: Add to database
-        report_id = add_report(
-            procedure_type=procedure_type,
-            specialty=specialty,
-            report_text=deid_text,
-            source=SOURCE,
-            report_name=file_path.stem,
-            keywords=None,
-            is_deidentified=True
-        )
-        result['report_id'] = report_id
-
-        # Step 6: Add to ChromaDB for RAG
-        rag_engine.add_single_report(
-            report_id=report_id,
-            report_text=deid_text,
-            procedure_type=procedure_type,
-            specialty=specialty
-        )
 
-        # Step 7: Move original to imported/
-        imported_path = IMPORTED_DIR / file_path.name
-        # Handle duplicate filenames
-        counter = 1
-        while imported_path.exists():
-            imported_path = IMPORTED_DIR / f"{file_path.stem}_{counter}{file_path.suffix}"
+def imported_path_for(file_path: Path, used_names: Set[str], next_suffix: Dict[str, int]) -> Path:
+    """
+    Reserve a free destination in imported/ for file_path.
+
+    Duplicate names get a _1, _2, ... suffix. Candidates are chosen against
+    the in-memory used_names set, and next_suffix remembers where each
+    name's numbering left off, so no per-candidate exists() probes are
+    needed. The chosen name is then claimed by creating an empty file with
+    O_CREAT | O_EXCL, so a file that appeared since used_names was listed
+    is never overwritten; the caller moves the original over the
+    placeholder.
+    """
+    counter = next_suffix.get(file_path.name, 1)
+    name = file_path.name
+    while True:
+        while name in used_names:
+            name = f"{file_path.stem}_{counter}{file_path.suffix}"
             counter += 1
-        shutil.move(str(file_path), str(imported_path))
+        used_names.add(name)
+        try:
+            os.close(os.open(IMPORTED_DIR / name, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            continue
+        if name != file_path.name:
+            next_suffix[file_path.name] = counter
+        return IMPORTED_DIR / name
+
+
+def import_ready_reports(results: List[Dict], rag_engine: 'RAGEngine') -> None:
+    """
+    Import all 'ready' results (phase 3 of the import).
 
-        result['status'] = 'success'
+    Inserts every report in one database transaction, indexes them in
+    ChromaDB in batches, and moves each original to imported/. Updates
+    each result's status, report_id and error in place.
+    """
+    ready = [r for r in results if r['status'] == 'ready']
+    if not ready:
+        return
 
+    # Step 5: Add to database in a single transaction
+    try:
+        report_ids = add_reports_bulk(
+            (r['procedure_type'], r['specialty'], r['file_path'].stem, r['deid_text'], None, SOURCE, True)
+            for r in ready
+        )
     except Exception as e:
-        result['status'] = 'failed'
-        result['error'] = str(e)
+        for r in ready:
+            r['status'] = 'failed'
+            r['error'] = f"Database insert failed: {e}"
+        return
 
-    return result
+    for r, report_id in zip(ready, report_ids):
+        r['report_id'] = report_id
+
+    # Step 6: Add to ChromaDB for RAG, one collection.add() per batch
+    for start in range(0, len(ready), RAG_BATCH_SIZE):
+        batch = ready[start:start + RAG_BATCH_SIZE]
+        try:
+            rag_engine.add_reports_batch(
+                [r['report_id'] for r in batch],
+                [r['deid_text'] for r in batch],
+                [r['procedure_type'] for r in batch],
+                [r['specialty'] for r in batch]
+            )
+        except Exception as e:
+            for r in batch:
+                r['status'] = 'failed'
+                r['error'] = f"RAG indexing failed: {e}"
+
+    # Names already taken in imported/, listed once instead of probed per file
+    used_names = {p.name for p in IMPORTED_DIR.iterdir()}
+    next_suffix = {}
+
+    for r in ready:
+        if r['status'] != 'ready':
+            continue
+        try:
+            # Step 7: Move original to imported/
+            file_path = r['file_path']
+            imported_path = imported_path_for(file_path, used_names, next_suffix)
+            try:
+                # Single rename over the reserved placeholder when raw/ and
+                # imported/ share a filesystem
+                os.replace(file_path, imported_path)
+            except OSError:
+                try:
+                    shutil.move(str(file_path), str(imported_path))
+                except Exception:
+                    imported_path.unlink(missing_ok=True)
+                    raise
+
+            r['status'] = 'success'
+
+        except Exception as e:
+            r['status'] = 'failed'
+            r['error'] = str(e)
 
 
 def bulk_import():
@@ -243,23 +382,17 @@ def bulk_import():
     print("Initializing database...")
     init_db()
 
-    # Initialize engines
-    print("Initializing OCR engine...")
-    ocr_engine = OCREngine()
-
-    print("Initializing RAG engine...")
-    rag_engine = RAGEngine()
-
     # Scan for files
     print(f"\nScanning {RAW_DIR}...")
-    files_to_process = []
-    for ext in ALL_EXTENSIONS:
-        files_to_process.extend(RAW_DIR.glob(f"*{ext}"))
-        files_to_process.extend(RAW_DIR.glob(f"*{ext.upper()}"))
-
-    # Remove duplicates (case-insensitive matching might cause this)
-    files_to_process = list(set(files_to_process))
-    files_to_process.sort(key=lambda x: x.name.lower())
+    # One directory read; extensions are matched case-insensitively
+    with os.scandir(RAW_DIR) as entries:
+        found = [
+            (entry.name.lower(), Path(entry.path))
+            for entry in entries
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower() in ALL_EXTENSIONS
+        ]
+    found.sort(key=lambda item: item[0])
+    files_to_process = [path for _, path in found]
 
     if not files_to_process:
         print("\nNo files found to process.")
@@ -268,21 +401,49 @@ def bulk_import():
         return
 
     print(f"Found {len(files_to_process)} file(s) to process")
+
+    # Heavy imports (ollama, chromadb, sentence-transformers) only when there is work
+    from ocr_engine import OCREngine
+    from rag_engine import RAGEngine
+
+    # Initialize engines
+    print("\nInitializing OCR engine...")
+    ocr_engine = OCREngine()
+
+    print("Initializing RAG engine...")
+    rag_engine = RAGEngine()
     print()
 
-    # Process each file
+    # Extract text from files concurrently
     results = []
-    for i, file_path in enumerate(files_to_process, 1):
-        print(f"[{i}/{len(files_to_process)}] Processing: {file_path.name}...", end=" ", flush=True)
-        result = process_file(file_path, ocr_engine, rag_engine)
-        results.append(result)
-
-        if result['status'] == 'success':
-            print(f"✓ (ID: {result['report_id']})")
-        elif result['status'] == 'skipped':
-            print(f"⊘ Skipped: {result['error']}")
-        else:
-            print(f"✗ Failed: {result['error']}")
+    with ThreadPoolExecutor(max_workers=EXTRACT_WORKERS) as executor:
+        futures = [executor.submit(process_file, file_path, ocr_engine) for file_path in files_to_process]
+        for i, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+
+            print(f"[{i}/{len(files_to_process)}] {result['filename']}:", end=" ")
+            if result['status'] == 'extracted':
+                print("✓")
+            elif result['status'] == 'skipped':
+                print(f"⊘ Skipped: {result['error']}")
+            else:
+                print(f"✗ Failed: {result['error']}")
+
+    # Keep import order (and report IDs) following the sorted file list
+    results.sort(key=lambda r: r['filename'].lower())
+
+    # De-identify everything that was extracted in one Philter run
+    extracted_count = sum(1 for r in results if r['status'] == 'extracted')
+    if extracted_count:
+        print(f"\nDe-identifying {extracted_count} report(s) with Philter...")
+        deidentify_extracted(results)
+
+    # Import everything that was extracted in one database transaction
+    ready_count = sum(1 for r in results if r['status'] == 'ready')
+    if ready_count:
+        print(f"\nImporting {ready_count} report(s) into the database...")
+        import_ready_reports(results, rag_engine)
 
     # Print summary
     print()
@@ -326,10 +487,11 @@ def bulk_import():
         print("\nProcedure types extracted:")
         for r in successful:
             proc = r['procedure_type'][:50] + "..." if len(r['procedure_type']) > 50 else r['procedure_type']
-            print(f"  - {r['filename']}: {proc}")
+            print(f"  - {r['filename']} (ID: {r['report_id']}): {proc}")
 
     print()
-    print(f"De-identified files saved to: {DEID_DIR.absolute()}")
+    if SAVE_DEID_COPY:
+        print(f"De-identified files saved to: {DEID_DIR.absolute()}")
     print(f"Original files moved to: {IMPORTED_DIR.absolute()}")
 
 
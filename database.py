@@ -2,21 +2,62 @@
 Database module for medical reports storage and retrieval.
 """
 
+import atexit
 import sqlite3
 import json
+import threading
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple
 
 DATABASE_PATH = "reports.db"
 
+_INSERT_REPORT_SQL = """
+    INSERT INTO reports (procedure_type, specialty, report_name, report_text, keywords, source, is_deidentified)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# One cached connection per thread, reused across calls
+_local = threading.local()
+_all_connections: List[sqlite3.Connection] = []
+_all_connections_lock = threading.Lock()
+
 
 def get_connection() -> sqlite3.Connection:
-    """Get a database connection with row factory enabled."""
-    conn = sqlite3.connect(DATABASE_PATH)
+    """
+    Get this thread's database connection with row factory enabled.
+
+    The connection is opened once per thread and reused, in autocommit
+    mode; use an explicit BEGIN for multi-statement transactions.
+    Callers must not close it.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.path == DATABASE_PATH:
+        return conn
+
+    conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False, isolation_level=None)
     conn.row_factory = sqlite3.Row
+    # WAL + NORMAL sync: commits no longer fsync the journal every time
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MB page cache
+
+    _local.conn = conn
+    _local.path = DATABASE_PATH
+    with _all_connections_lock:
+        _all_connections.append(conn)
     return conn
 
 
+@atexit.register
+def _close_connections() -> None:
+    """Close every cached connection at interpreter exit."""
+    with _all_connections_lock:
+        for conn in _all_connections:
+            conn.close()
+        _all_connections.clear()
+
+
 def init_db() -> None:
     """Initialize the database with required tables."""
     conn = get_connection()
@@ -49,8 +90,69 @@ def init_db() -> None:
         )
     """)
 
-    conn.commit()
-    conn.close()
+    # Cached RAG embeddings, keyed by report; text_hash detects stale entries
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS report_embeddings (
+            report_id INTEGER PRIMARY KEY,
+            text_hash TEXT NOT NULL,
+            embedding BLOB NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS report_embeddings_delete AFTER DELETE ON reports BEGIN
+            DELETE FROM report_embeddings WHERE report_id = old.id;
+        END
+    """)
+
+    # Indexes for source/specialty/procedure filters and GROUP BY source
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_source ON reports(source)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_specialty ON reports(specialty)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_procedure ON reports(procedure_type)")
+
+    # Full-text index over reports, kept in sync by triggers
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reports_fts'")
+    fts_exists = cursor.fetchone() is not None
+
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+            report_text, keywords, procedure_type,
+            content='reports', content_rowid='id'
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_fts_insert AFTER INSERT ON reports BEGIN
+            INSERT INTO reports_fts (rowid, report_text, keywords, procedure_type)
+            VALUES (new.id, new.report_text, new.keywords, new.procedure_type);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_fts_delete AFTER DELETE ON reports BEGIN
+            INSERT INTO reports_fts (reports_fts, rowid, report_text, keywords, procedure_type)
+            VALUES ('delete', old.id, old.report_text, old.keywords, old.procedure_type);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_fts_update AFTER UPDATE ON reports BEGIN
+            INSERT INTO reports_fts (reports_fts, rowid, report_text, keywords, procedure_type)
+            VALUES ('delete', old.id, old.report_text, old.keywords, old.procedure_type);
+            INSERT INTO reports_fts (rowid, report_text, keywords, procedure_type)
+            VALUES (new.id, new.report_text, new.keywords, new.procedure_type);
+        END
+    """)
+
+    # Index reports that existed before the FTS table was added
+    if not fts_exists:
+        cursor.execute("INSERT INTO reports_fts (reports_fts) VALUES ('rebuild')")
+
+
+def fts_phrase(text: str, column: Optional[str] = None) -> str:
+    """
+    Build an FTS5 query matching text as a phrase, with the last word as a prefix.
+
+    Quoting keeps user input from being parsed as FTS5 query syntax.
+    """
+    phrase = '"' + text.replace('"', '""') + '"*'
+    return f"{column} : {phrase}" if column else phrase
 
 
 def add_report(
@@ -68,18 +170,44 @@ def add_report(
     Returns the ID of the inserted report.
     """
     conn = get_connection()
-    cursor = conn.cursor()
+    cursor = conn.execute(
+        _INSERT_REPORT_SQL,
+        (procedure_type, specialty, report_name, report_text, keywords, source, is_deidentified)
+    )
 
-    cursor.execute("""
-        INSERT INTO reports (procedure_type, specialty, report_name, report_text, keywords, source, is_deidentified)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (procedure_type, specialty, report_name, report_text, keywords, source, is_deidentified))
+    return cursor.lastrowid
 
-    report_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
 
-    return report_id
+def add_reports_bulk(rows: Iterable[Tuple]) -> List[int]:
+    """
+    Add many reports in a single transaction.
+
+    Args:
+        rows: Tuples of (procedure_type, specialty, report_name, report_text,
+              keywords, source, is_deidentified)
+
+    Returns the IDs of the inserted reports, in input order.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        # Take the write lock up front so no other writer can interleave ids
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.executemany(_INSERT_REPORT_SQL, rows)
+        cursor.execute("SELECT last_insert_rowid()")
+        last_id = cursor.fetchone()[0]
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+
+    # AUTOINCREMENT ids within one write transaction are contiguous
+    return list(range(last_id - len(rows) + 1, last_id + 1))
 
 
 def get_report(report_id: int) -> Optional[Dict[str, Any]]:
@@ -89,7 +217,6 @@ def get_report(report_id: int) -> Optional[Dict[str, Any]]:
 
     cursor.execute("SELECT * FROM reports WHERE id = ?", (report_id,))
     row = cursor.fetchone()
-    conn.close()
 
     if row:
         return dict(row)
@@ -109,7 +236,7 @@ def search_reports(
     Args:
         specialty: Filter by specialty (partial match)
         procedure_type: Filter by procedure type (partial match)
-        keyword: Search in keywords field (partial match)
+        keyword: Search in keywords field (full-text word/prefix match)
         source: Filter by source (exact match)
         limit: Maximum number of results to return
 
@@ -130,8 +257,8 @@ def search_reports(
         params.append(f"%{procedure_type}%")
 
     if keyword:
-        query += " AND keywords LIKE ?"
-        params.append(f"%{keyword}%")
+        query += " AND id IN (SELECT rowid FROM reports_fts WHERE reports_fts MATCH ?)"
+        params.append(fts_phrase(keyword, column="keywords"))
 
     if source:
         query += " AND source = ?"
@@ -141,10 +268,8 @@ def search_reports(
     params.append(limit)
 
     cursor.execute(query, params)
-    rows = cursor.fetchall()
-    conn.close()
 
-    return [dict(row) for row in rows]
+    return [dict(row) for row in cursor]
 
 
 def delete_report(report_id: int) -> bool:
@@ -159,22 +284,47 @@ def delete_report(report_id: int) -> bool:
     cursor.execute("DELETE FROM reports WHERE id = ?", (report_id,))
     deleted = cursor.rowcount > 0
 
-    conn.commit()
-    conn.close()
-
     return deleted
 
 
+def iter_reports(limit: int = 1000, offset: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over all reports with pagination.
+
+    Rows are read from the cursor one at a time, so only the current
+    report is held in memory. Exhaust or close the iterator before
+    writing to the database from the same thread.
+    """
+    conn = get_connection()
+    cursor = conn.execute("SELECT * FROM reports LIMIT ? OFFSET ?", (limit, offset))
+
+    for row in cursor:
+        yield dict(row)
+
+
 def get_all_reports(limit: int = 1000, offset: int = 0) -> List[Dict[str, Any]]:
     """Get all reports with pagination."""
+    return list(iter_reports(limit, offset))
+
+
+def get_all_reports_summary(limit: int = 1000, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    Get summary rows for all reports with pagination.
+
+    Returns only the listing columns plus the first 100 characters of
+    report_text as 'preview', so full texts are never transferred.
+    Use get_report() for the full text.
+    """
     conn = get_connection()
     cursor = conn.cursor()
 
-    cursor.execute("SELECT * FROM reports LIMIT ? OFFSET ?", (limit, offset))
-    rows = cursor.fetchall()
-    conn.close()
+    cursor.execute("""
+        SELECT id, procedure_type, specialty, source, added_at,
+               SUBSTR(report_text, 1, 100) AS preview
+        FROM reports LIMIT ? OFFSET ?
+    """, (limit, offset))
 
-    return [dict(row) for row in rows]
+    return [dict(row) for row in cursor]
 
 
 def get_report_count_by_source() -> Dict[str, int]:
@@ -183,10 +333,45 @@ def get_report_count_by_source() -> Dict[str, int]:
     cursor = conn.cursor()
 
     cursor.execute("SELECT source, COUNT(*) as count FROM reports GROUP BY source")
-    rows = cursor.fetchall()
-    conn.close()
 
-    return {row['source']: row['count'] for row in rows}
+    return {source: count for source, count in cursor}
+
+
+def get_report_embeddings() -> Dict[int, Tuple[str, bytes]]:
+    """
+    Get every stored report embedding.
+
+    Returns a dict mapping report_id to (text_hash, embedding bytes).
+    """
+    conn = get_connection()
+    cursor = conn.execute("SELECT report_id, text_hash, embedding FROM report_embeddings")
+
+    return {report_id: (text_hash, embedding) for report_id, text_hash, embedding in cursor}
+
+
+def save_report_embeddings(rows: Iterable[Tuple[int, str, bytes]]) -> None:
+    """
+    Store report embeddings in a single transaction, replacing existing ones.
+
+    Args:
+        rows: Tuples of (report_id, text_hash, embedding bytes)
+    """
+    rows = list(rows)
+    if not rows:
+        return
+
+    conn = get_connection()
+
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("""
+            INSERT OR REPLACE INTO report_embeddings (report_id, text_hash, embedding)
+            VALUES (?, ?, ?)
+        """, rows)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
 
 
 # Generated reports functions for Track 2
@@ -217,8 +402,6 @@ def add_generated_report(
     """, (procedure_type, json.dumps(surgeon_inputs), generated_report, user_rating))
 
     report_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
 
     return report_id
 
@@ -230,7 +413,6 @@ def get_generated_report(report_id: int) -> Optional[Dict[str, Any]]:
 
     cursor.execute("SELECT * FROM generated_reports WHERE id = ?", (report_id,))
     row = cursor.fetchone()
-    conn.close()
 
     if row:
         result = dict(row)
@@ -8,6 +8,10 @@ from docx import Document
 from docx.shared import Pt, Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 
+# Numbered list items ("1. text" or "1 text") and the prefix to strip
+NUMBERED_ITEM = re.compile(r'^\d+\.?\s')
+NUMBERED_PREFIX = re.compile(r'^\d+\.?\s*')
+
 
 def is_section_header(line: str) -> bool:
     """
@@ -29,9 +33,10 @@ def is_section_header(line: str) -> bool:
     if clean_line.endswith(':'):
         return True
 
-    # Check if line is all uppercase (allowing spaces and punctuation)
-    alpha_chars = ''.join(c for c in clean_line if c.isalpha())
-    if alpha_chars and alpha_chars.isupper() and len(alpha_chars) >= 3:
+    # Check if line is all uppercase (allowing spaces and punctuation).
+    # str.isupper() ignores uncased characters, so it rejects ordinary
+    # lines in C; letters are only counted for the few that pass.
+    if clean_line.isupper() and sum(c.isalpha() for c in clean_line) >= 3:
         return True
 
     return False
@@ -70,68 +75,45 @@ def export_to_docx(report_text: str, filename: str) -> str:
     # Add a blank line after title
     doc.add_paragraph()
 
-    # Split report into lines and process
-    lines = report_text.split('\n')
+    # Split report into lines and process in a single pass
     current_paragraph = []
 
-    for line in lines:
+    def flush_paragraph():
+        """Write any accumulated text lines as one paragraph."""
+        if current_paragraph:
+            doc.add_paragraph(clean_markdown(' '.join(current_paragraph)))
+            current_paragraph.clear()
+
+    for line in report_text.split('\n'):
         line = line.strip()
 
-        # Skip empty lines - they indicate paragraph breaks
+        # Empty lines indicate paragraph breaks
         if not line:
-            # Flush current paragraph if any
-            if current_paragraph:
-                para_text = ' '.join(current_paragraph)
-                doc.add_paragraph(clean_markdown(para_text))
-                current_paragraph = []
-            continue
-
-        # Check if this is a section header
-        if is_section_header(line):
-            # Flush current paragraph first
-            if current_paragraph:
-                para_text = ' '.join(current_paragraph)
-                doc.add_paragraph(clean_markdown(para_text))
-                current_paragraph = []
-
-            # Add header as bold paragraph
-            clean_header = clean_markdown(line)
+            flush_paragraph()
+
+        # Section header - add as bold paragraph
+        elif is_section_header(line):
+            flush_paragraph()
             para = doc.add_paragraph()
-            run = para.add_run(clean_header)
+            run = para.add_run(clean_markdown(line))
             run.bold = True
 
-        # Check if this is a list item
-        elif line.startswith('- ') or line.startswith('• '):
-            # Flush current paragraph first
-            if current_paragraph:
-                para_text = ' '.join(current_paragraph)
-                doc.add_paragraph(clean_markdown(para_text))
-                current_paragraph = []
-
-            # Add as list item with indent
-            clean_item = clean_markdown(line[2:])  # Remove bullet
-            para = doc.add_paragraph(clean_item, style='List Bullet')
-
-        # Check if this is a numbered list item
-        elif re.match(r'^\d+\.?\s', line):
-            # Flush current paragraph first
-            if current_paragraph:
-                para_text = ' '.join(current_paragraph)
-                doc.add_paragraph(clean_markdown(para_text))
-                current_paragraph = []
-
-            # Add as numbered item
-            clean_item = clean_markdown(re.sub(r'^\d+\.?\s*', '', line))
-            para = doc.add_paragraph(clean_item, style='List Number')
+        # Bulleted list item - add with indent
+        elif line.startswith(('- ', '• ')):
+            flush_paragraph()
+            doc.add_paragraph(clean_markdown(line[2:]), style='List Bullet')
+
+        # Numbered list item
+        elif NUMBERED_ITEM.match(line):
+            flush_paragraph()
+            doc.add_paragraph(clean_markdown(NUMBERED_PREFIX.sub('', line)), style='List Number')
 
         else:
             # Regular text - accumulate into paragraph
             current_paragraph.append(line)
 
     # Flush any remaining paragraph
-    if current_paragraph:
-        para_text = ' '.join(current_paragraph)
-        doc.add_paragraph(clean_markdown(para_text))
+    flush_paragraph()
 
     # Ensure filename doesn't have extension
     if filename.endswith('.docx'):
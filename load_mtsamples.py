@@ -2,13 +2,21 @@
 Script to load MTSamples data into the reports database.
 """
 
-import pandas as pd
-from collections import Counter
-from database import init_db, add_report
+from itertools import repeat
+from typing import TYPE_CHECKING
+from database import init_db, add_reports_bulk
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Target specialties to filter
 TARGET_SPECIALTIES = {'Surgery', 'General Surgery', 'Gastroenterology'}
 
+def to_nullable(series: 'pd.Series') -> 'pd.Series':
+    """Replace NaN with None so missing values are stored as SQL NULL."""
+    return series.astype(object).where(series.notna(), None)
+
+
 def load_mtsamples():
     """Load MTSamples data into the database."""
 
@@ -16,7 +24,8 @@ def load_mtsamples():
     print("Initializing database...")
     init_db()
 
-    # Read CSV
+    # Read CSV (pandas is imported here so importing this module stays cheap)
+    import pandas as pd
     print("Reading mtsamples.csv...")
     df = pd.read_csv('mtsamples.csv')
 
@@ -29,38 +38,36 @@ def load_mtsamples():
     df_filtered = df[df['medical_specialty'].isin(TARGET_SPECIALTIES)].copy()
     print(f"Records matching target specialties: {len(df_filtered)}")
 
-    # Drop rows where transcription is empty/null
+    # Drop rows where transcription is empty/null. Searching for any
+    # non-space character avoids building a stripped copy of every report.
     df_filtered = df_filtered.dropna(subset=['transcription'])
-    df_filtered = df_filtered[df_filtered['transcription'].str.strip() != '']
+    df_filtered = df_filtered[df_filtered['transcription'].str.contains(r'\S', regex=True)]
     print(f"Records after removing empty transcriptions: {len(df_filtered)}")
 
-    # Track statistics
-    specialty_counts = Counter()
-    procedure_counts = Counter()
-    loaded_count = 0
+    # Strip the short metadata columns in one vectorized pass
+    for column in ['description', 'sample_name', 'keywords']:
+        df_filtered[column] = df_filtered[column].str.strip()
 
-    # Insert each record
+    df_filtered['procedure_type'] = df_filtered['description'].fillna('Unknown')
+    df_filtered['report_name'] = to_nullable(df_filtered['sample_name'])
+    df_filtered['keywords'] = to_nullable(df_filtered['keywords'])
+
+    # Insert all rows in a single transaction
     print("\nLoading records into database...")
-    for _, row in df_filtered.iterrows():
-        specialty = row['medical_specialty']
-        procedure_type = row['description'] if pd.notna(row['description']) else 'Unknown'
-        report_name = row['sample_name'] if pd.notna(row['sample_name']) else None
-        report_text = row['transcription']
-        keywords = row['keywords'] if pd.notna(row['keywords']) else None
-
-        add_report(
-            procedure_type=procedure_type.strip() if isinstance(procedure_type, str) else procedure_type,
-            specialty=specialty,
-            report_text=report_text,
-            source='MTSamples/Kaggle',
-            report_name=report_name.strip() if isinstance(report_name, str) and report_name else report_name,
-            keywords=keywords.strip() if isinstance(keywords, str) else keywords,
-            is_deidentified=True
-        )
-
-        specialty_counts[specialty] += 1
-        procedure_counts[procedure_type.strip() if isinstance(procedure_type, str) else procedure_type] += 1
-        loaded_count += 1
+    rows = list(zip(
+        df_filtered['procedure_type'],
+        df_filtered['medical_specialty'],
+        df_filtered['report_name'],
+        df_filtered['transcription'],
+        df_filtered['keywords'],
+        repeat('MTSamples/Kaggle'),
+        repeat(True)
+    ))
+    loaded_count = len(add_reports_bulk(rows))
+
+    # Track statistics
+    specialty_counts = df_filtered['medical_specialty'].value_counts()
+    procedure_counts = df_filtered['procedure_type'].value_counts()
 
     # Print summary
     print("\n" + "=" * 60)
@@ -71,12 +78,12 @@ def load_mtsamples():
 
     print("\nBreakdown by specialty:")
     print("-" * 40)
-    for specialty, count in sorted(specialty_counts.items()):
+    for specialty, count in specialty_counts.sort_index().items():
         print(f"  {specialty}: {count}")
 
     print("\nTop 10 procedure types:")
     print("-" * 40)
-    for procedure, count in procedure_counts.most_common(10):
+    for procedure, count in procedure_counts.head(10).items():
         # Truncate long procedure descriptions
         display_proc = procedure[:60] + "..." if len(str(procedure)) > 60 else procedure
         print(f"  {display_proc}: {count}")
@@ -0,0 +1,79 @@
+"""
+LRU Cache - Small thread-safe in-memory cache shared by the app's handlers.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+def hash_key(*parts: str) -> str:
+    """
+    Build a SHA-256 cache key from one or more strings.
+
+    Parts are joined with a separator that cannot appear in form input,
+    so ("a", "bc") and ("ab", "c") hash differently.
+    """
+    return hashlib.sha256("\u0001".join(parts).encode('utf-8')).hexdigest()
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """Build a SHA-256 cache key from a file's contents, read in 1 MB chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts the least recently used entry.
+
+    Unlike functools.lru_cache, callers decide what gets stored, so
+    error results are never cached. Entries optionally expire after ttl
+    seconds.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of entries kept before evicting
+            ttl: Seconds an entry stays valid after being stored (None = forever)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss or expiry."""
+        with self._lock:
+            if key not in self._data:
+                return None
+            stored_at, value = self._data[key]
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the oldest entry if the cache is full."""
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -3,15 +3,24 @@ OCR Engine using MiniCPM-V via Ollama for extracting text from images and PDFs.
 """
 
 import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
 import ollama
 from pdf2image import convert_from_path
 
+from lru_cache import LRUCache, hash_file
+
 MODEL_NAME = "minicpm-v"
 OCR_PROMPT = "Extract all text from this image. Return only the extracted text, preserving the original formatting and structure."
 
+# OCR requests in flight per engine, across all callers. PDF pages are sent
+# concurrently up to this limit; match it to the server's OLLAMA_NUM_PARALLEL.
+OCR_CONCURRENCY = 4
+
 
 class OCREngine:
     """OCR engine using MiniCPM-V via Ollama for text extraction."""
@@ -24,6 +33,12 @@ class OCREngine:
             model: The Ollama model to use for OCR (default: minicpm-v)
         """
         self.model = model
+        # One persistent HTTP client for all requests to the Ollama server
+        self._client = ollama.Client()
+        # OCR results keyed by SHA-256 of the file contents
+        self._cache = LRUCache(maxsize=64)
+        # Bounds concurrent requests so page fan-out can't flood the Ollama queue
+        self._ocr_slots = threading.BoundedSemaphore(OCR_CONCURRENCY)
 
     def process_image(self, image_path: str) -> str:
         """
@@ -46,14 +61,15 @@ class OCREngine:
                 return f"Error: Unsupported image format: {ext}. Use .png, .jpg, or .jpeg"
 
             # Call Ollama with vision capability
-            response = ollama.chat(
-                model=self.model,
-                messages=[{
-                    'role': 'user',
-                    'content': OCR_PROMPT,
-                    'images': [image_path]
-                }]
-            )
+            with self._ocr_slots:
+                response = self._client.chat(
+                    model=self.model,
+                    messages=[{
+                        'role': 'user',
+                        'content': OCR_PROMPT,
+                        'images': [image_path]
+                    }]
+                )
 
             return response['message']['content']
 
@@ -82,33 +98,33 @@ class OCREngine:
             if not pdf_path.lower().endswith('.pdf'):
                 return f"Error: File is not a PDF: {pdf_path}"
 
-            # Convert PDF pages to images
-            try:
-                images = convert_from_path(pdf_path, dpi=dpi)
-            except Exception as e:
-                return f"Error: Failed to convert PDF to images - {str(e)}"
-
-            if not images:
-                return "Error: PDF contains no pages"
-
-            # Process each page
-            page_texts = []
-            total_pages = len(images)
-
-            for i, image in enumerate(images, 1):
-                # Save temporary image
-                temp_path = f"/tmp/ocr_page_{i}.png"
+            with tempfile.TemporaryDirectory(prefix="ocr_pdf_") as temp_dir:
+                # Rasterize pages in parallel straight to PNG files; the page
+                # files are sent to OCR as-is, so no images are held in memory
                 try:
-                    image.save(temp_path, 'PNG')
-
-                    # Run OCR on page
-                    page_text = self._process_image_internal(temp_path)
-                    page_texts.append(f"--- Page {i} of {total_pages} ---\n{page_text}")
-
-                finally:
-                    # Clean up temp file
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
+                    page_paths = convert_from_path(
+                        pdf_path,
+                        dpi=dpi,
+                        thread_count=max(1, (os.cpu_count() or 1) - 1),
+                        output_folder=temp_dir,
+                        fmt='png',
+                        paths_only=True
+                    )
+                except Exception as e:
+                    return f"Error: Failed to convert PDF to images - {str(e)}"
+
+                if not page_paths:
+                    return "Error: PDF contains no pages"
+
+                # OCR pages concurrently; map() returns the texts in page order
+                total_pages = len(page_paths)
+                with ThreadPoolExecutor(max_workers=min(OCR_CONCURRENCY, total_pages)) as executor:
+                    page_results = list(executor.map(self._process_image_internal, page_paths))
+
+            page_texts = [
+                f"--- Page {i} of {total_pages} ---\n{page_text}"
+                for i, page_text in enumerate(page_results, 1)
+            ]
 
             return "\n\n".join(page_texts)
 
@@ -118,7 +134,7 @@ class OCREngine:
     def _process_image_internal(self, image_path: str) -> str:
         """
         Internal method for processing images without file validation.
-        Used by process_pdf for temporary images.
+        Used by process_pdf for rendered page files.
 
         Args:
             image_path: Path to the image file
@@ -127,14 +143,15 @@ class OCREngine:
             Extracted text or error message
         """
         try:
-            response = ollama.chat(
-                model=self.model,
-                messages=[{
-                    'role': 'user',
-                    'content': OCR_PROMPT,
-                    'images': [image_path]
-                }]
-            )
+            with self._ocr_slots:
+                response = self._client.chat(
+                    model=self.model,
+                    messages=[{
+                        'role': 'user',
+                        'content': OCR_PROMPT,
+                        'images': [image_path]
+                    }]
+                )
             return response['message']['content']
 
         except ollama.ResponseError as e:
@@ -164,6 +181,32 @@ class OCREngine:
         else:
             return f"Error: Unsupported file type: {ext}. Supported: .png, .jpg, .jpeg, .pdf"
 
+    def process_file_cached(self, file_path: str) -> str:
+        """
+        Like process_file, but reuses the result for a file with identical contents.
+
+        Uploads get a new temp path each time, so the cache is keyed on the
+        file's SHA-256 rather than its path. Errors are not cached.
+
+        Args:
+            file_path: Path to an image (.png/.jpg/.jpeg) or PDF (.pdf) file
+
+        Returns:
+            Extracted text from the file
+        """
+        if not os.path.exists(file_path):
+            return f"Error: File not found: {file_path}"
+
+        key = hash_file(file_path)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        text = self.process_file(file_path)
+        if not text.startswith("Error:"):
+            self._cache.set(key, text)
+        return text
+
 
 if __name__ == "__main__":
     import sys
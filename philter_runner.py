@@ -10,13 +10,27 @@ import sys
 import tempfile
 import shutil
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+
+from lru_cache import LRUCache, hash_key
 
 # Paths
 PHILTER_DIR = Path(__file__).parent / "philter"
 DEIDPIPE_SCRIPT = PHILTER_DIR / "deidpipe.py"
 DEFAULT_CONFIG = "configs/philter_one2024.json"
 
+# Texts per Philter run in deidentify_batch, and the run's timeout: a fixed
+# allowance for startup plus a per-text allowance
+PHILTER_BATCH_SIZE = 32
+PHILTER_STARTUP_TIMEOUT = 120
+PHILTER_TIMEOUT_PER_TEXT = 15
+
+# De-identified output keyed by SHA-256 of (config, raw text); Philter is deterministic
+_deid_cache = LRUCache(maxsize=512)
+
+# Hashes of texts Philter itself produced, so its output isn't de-identified twice
+_deid_outputs = LRUCache(maxsize=512)
+
 
 def deidentify_text(raw_text: str, config: str = DEFAULT_CONFIG) -> str:
     """
@@ -88,10 +102,117 @@ def deidentify_text(raw_text: str, config: str = DEFAULT_CONFIG) -> str:
             shutil.rmtree(temp_dir, ignore_errors=True)
 
 
+def deidentify_text_cached(raw_text: str, config: str = DEFAULT_CONFIG) -> str:
+    """
+    De-identify a text string, reusing the result for text seen before.
+
+    Shared by both app tabs so a note ingested in one tab and extracted
+    in the other only goes through Philter once. Text that is itself a
+    recent Philter output (e.g. copied from Tab 1's de-identified box)
+    is returned unchanged. Errors are not cached.
+
+    Args:
+        raw_text: The raw text containing PHI to de-identify
+        config: Path to Philter config file (relative to philter dir)
+
+    Returns:
+        De-identified text string, or error message if processing fails
+    """
+    if _deid_outputs.get(hash_key(config, raw_text.strip())):
+        return raw_text
+
+    key = hash_key(config, raw_text)
+    cached = _deid_cache.get(key)
+    if cached is not None:
+        return cached
+
+    deid_text = deidentify_text(raw_text, config)
+    if not deid_text.startswith("Error:"):
+        _deid_cache.set(key, deid_text)
+        _deid_outputs.set(hash_key(config, deid_text.strip()), True)
+    return deid_text
+
+
+def deidentify_batch(texts: List[str], config: str = DEFAULT_CONFIG) -> List[str]:
+    """
+    De-identify many text strings with as few Philter runs as possible.
+
+    Texts go through Philter in chunks of PHILTER_BATCH_SIZE, so the
+    subprocess and model startup cost is paid once per chunk rather than
+    per text. A chunk whose run fails is retried one text at a time, so a
+    single bad note cannot fail the others.
+
+    Args:
+        texts: Raw texts containing PHI to de-identify
+        config: Path to Philter config file (relative to philter dir)
+
+    Returns:
+        De-identified texts in input order; an entry is an error message
+        if that text failed
+    """
+    deid_texts = []
+    for start in range(0, len(texts), PHILTER_BATCH_SIZE):
+        chunk = texts[start:start + PHILTER_BATCH_SIZE]
+        chunk_results = _deidentify_chunk(chunk, config)
+        if chunk_results is None:
+            chunk_results = [deidentify_text(text, config) for text in chunk]
+        deid_texts.extend(chunk_results)
+
+    return deid_texts
+
+
+def _deidentify_chunk(texts: List[str], config: str) -> Optional[List[str]]:
+    """
+    De-identify texts with a single Philter run over a temp directory.
+
+    Returns:
+        De-identified texts in input order, or None if the run itself
+        failed. A text Philter produced no output for is retried alone.
+    """
+    temp_dir = tempfile.mkdtemp(prefix="philter_batch_")
+    input_dir = os.path.join(temp_dir, "input")
+    output_dir = os.path.join(temp_dir, "output")
+
+    try:
+        os.makedirs(input_dir)
+
+        filenames = [f"note_{i:05d}.txt" for i in range(len(texts))]
+        for filename, text in zip(filenames, texts):
+            with open(os.path.join(input_dir, filename), 'w', encoding='utf-8') as f:
+                f.write(text)
+
+        timeout = PHILTER_STARTUP_TIMEOUT + PHILTER_TIMEOUT_PER_TEXT * len(texts)
+        statuses = deidentify_directory(input_dir, output_dir, config, timeout=timeout)
+        if statuses and not statuses[0][0]:
+            # Whole-run failure, reported without a filename
+            print(f"Philter batch of {len(texts)} failed, retrying one at a time: {statuses[0][1]}")
+            return None
+
+        deid_texts = []
+        for filename, text in zip(filenames, texts):
+            output_file = os.path.join(output_dir, filename)
+            if not os.path.exists(output_file):
+                deid_texts.append(deidentify_text(text, config))
+                continue
+            with open(output_file, 'r', encoding='utf-8') as f:
+                deid_texts.append(f.read())
+
+        return deid_texts
+
+    except Exception as e:
+        print(f"Philter batch of {len(texts)} failed, retrying one at a time: {str(e)}")
+        return None
+    finally:
+        # Clean up temp directory
+        if os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
 def deidentify_directory(
     input_dir: str,
     output_dir: str,
-    config: str = DEFAULT_CONFIG
+    config: str = DEFAULT_CONFIG,
+    timeout: int = 600
 ) -> List[Tuple[str, str]]:
     """
     De-identify all .txt files in a directory using Philter.
@@ -100,6 +221,7 @@ def deidentify_directory(
         input_dir: Path to directory containing .txt files with PHI
         output_dir: Path to directory where de-identified files will be saved
         config: Path to Philter config file (relative to philter dir)
+        timeout: Seconds before the Philter run is abandoned
 
     Returns:
         List of (filename, status) tuples indicating success/failure for each file
@@ -132,7 +254,7 @@ def deidentify_directory(
             cwd=str(PHILTER_DIR),
             capture_output=True,
             text=True,
-            timeout=600  # 10 minute timeout for batch
+            timeout=timeout
         )
 
         if result.returncode != 0:
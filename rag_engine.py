@@ -2,22 +2,255 @@
 RAG Engine for medical report retrieval using ChromaDB and sentence-transformers.
 """
 
+import queue
+import re
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from operator import itemgetter
 import chromadb
+import numpy as np
+import torch
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any, Optional
-from database import get_all_reports, get_report
+from typing import List, Dict, Any, Optional, Tuple
+from database import init_db, iter_reports, get_report, get_report_embeddings, save_report_embeddings
+from lru_cache import LRUCache, hash_key
 
 CHROMA_PERSIST_DIR = "./chroma_db"
 COLLECTION_NAME = "medical_reports"
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 
+# The encoder only reads the first 256 wordpieces of a text and drops the
+# rest. Cutting texts at 8 characters per token before encoding keeps every
+# token the model would see while sparing the tokenizer the discarded tail.
+EMBED_MAX_CHARS = 256 * 8
+
+# Reference reports farther than this cosine distance from the generation
+# query are left out of the LLM context. Loose on purpose: queries built from
+# a few form fields rarely exceed ~0.6 similarity even to a close match, so
+# this only drops reports that are effectively unrelated.
+CONTEXT_MAX_DISTANCE = 0.75
+
+# Reference reports longer than this many characters are condensed to their
+# sentences most relevant to the query before going into the LLM context.
+# Shorter reports are kept whole, since they also serve as structure examples;
+# the budget fits a typical operative report.
+CONTEXT_REPORT_CHARS = 3000
+
+# Sentence or line boundary; the captured whitespace is kept when sentences
+# are rejoined, so line breaks between sections survive condensing
+SENTENCE_BOUNDARY = re.compile(r'(\s*\n\s*|(?<=[.!?])[ \t]+)')
+
+# Section heading at the start of a line or sentence, e.g. "FINDINGS:" or
+# "PROCEDURE IN DETAIL". Condensed reports always keep their headings.
+SECTION_HEADING = re.compile(r'^[A-Z][A-Z0-9 /&,()\-]{2,}(?::|$)')
+
+# Headed sentences up to this long are kept whole; longer ones keep only the
+# heading unless they also rank among the most relevant sentences
+HEADING_LINE_CHARS = 120
+
+# Storage format of embeddings persisted in SQLite; part of each text hash,
+# so changing the format marks older blobs as stale
+EMBEDDING_STORAGE = "int8"
+
+# Loaded embedding models, shared by every RAGEngine in the process
+_MODEL_CACHE: Dict[str, SentenceTransformer] = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+
+
+def get_embedding_model(name: str = EMBEDDING_MODEL) -> SentenceTransformer:
+    """
+    Get a SentenceTransformer, loading it only the first time it is requested.
+
+    The model is placed on the GPU when one is available.
+
+    Args:
+        name: SentenceTransformer model name
+
+    Returns:
+        The shared model instance
+    """
+    with _MODEL_CACHE_LOCK:
+        model = _MODEL_CACHE.get(name)
+        if model is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            model = SentenceTransformer(name, device=device)
+            _MODEL_CACHE[name] = model
+        return model
+
+
+def _embedding_key(text: str) -> str:
+    """Hash identifying a report's embedding: its text, the model and the storage format."""
+    return hash_key(EMBEDDING_MODEL, EMBEDDING_STORAGE, text)
+
+
+def _indexed_key(embedding_key: str, procedure_type: str, specialty: str) -> str:
+    """Hash identifying an indexed report: its embedding plus the metadata filters use."""
+    return hash_key(embedding_key, str(procedure_type), str(specialty))
+
+
+@lru_cache(maxsize=512)
+def _embed_query(text: str) -> Tuple[float, ...]:
+    """
+    Embed a search query, reusing the embedding for a query seen before.
+
+    Regenerating a report after editing an unrelated field repeats the same
+    context query, so this skips the encoder. Returns a tuple so the cached
+    value can't be mutated by callers.
+    """
+    return tuple(get_embedding_model().encode(text, show_progress_bar=False).tolist())
+
+
+class FlatIndex:
+    """
+    Exact cosine-similarity index over report embeddings, held in memory.
+
+    For this corpus (a few thousand reports) a brute-force matrix-vector
+    product over normalized vectors is faster than an HNSW query and returns
+    exact neighbours; metadata filters are applied as a mask over the same
+    scores. ChromaDB remains the store for documents and full metadata.
+    Searches read an immutable snapshot, so they never wait on writers.
+    """
+
+    def __init__(self, dimension: int):
+        """
+        Initialize an empty index.
+
+        Args:
+            dimension: Embedding dimension
+        """
+        self._write_lock = threading.Lock()
+        # (ids, vectors, specialties, procedure_types), one row per report
+        self._snapshot = (
+            [],
+            np.empty((0, dimension), dtype=np.float32),
+            np.empty(0, dtype=object),
+            np.empty(0, dtype=object)
+        )
+
+    def __len__(self) -> int:
+        return len(self._snapshot[0])
+
+    def add(self, ids: List[str], embeddings: Any, metadatas: List[Optional[Dict[str, Any]]]) -> None:
+        """Add embeddings with their metadata, replacing any already stored under the same id."""
+        vectors = _normalize(embeddings)
+        metadatas = [metadata or {} for metadata in metadatas]
+        with self._write_lock:
+            current_ids, current_vectors, current_specialties, current_procedures = self._snapshot
+            positions = {id_: i for i, id_ in enumerate(current_ids)}
+            new_ids = list(current_ids)
+            rows = []
+            for id_ in ids:
+                if id_ not in positions:
+                    positions[id_] = len(new_ids)
+                    new_ids.append(id_)
+                rows.append(positions[id_])
+
+            size = len(new_ids)
+            new_vectors = np.empty((size, current_vectors.shape[1]), dtype=np.float32)
+            new_vectors[:len(current_ids)] = current_vectors
+            new_vectors[rows] = vectors
+
+            new_specialties = np.empty(size, dtype=object)
+            new_specialties[:len(current_ids)] = current_specialties
+            new_procedures = np.empty(size, dtype=object)
+            new_procedures[:len(current_ids)] = current_procedures
+            for row, metadata in zip(rows, metadatas):
+                new_specialties[row] = metadata.get("specialty")
+                new_procedures[row] = metadata.get("procedure_type")
+
+            self._snapshot = (new_ids, new_vectors, new_specialties, new_procedures)
+
+    def remove(self, ids: List[str]) -> None:
+        """Remove embeddings by id; unknown ids are ignored."""
+        removed = set(ids)
+        with self._write_lock:
+            current_ids, current_vectors, current_specialties, current_procedures = self._snapshot
+            keep = [i for i, id_ in enumerate(current_ids) if id_ not in removed]
+            if len(keep) == len(current_ids):
+                return
+            self._snapshot = (
+                [current_ids[i] for i in keep],
+                current_vectors[keep],
+                current_specialties[keep],
+                current_procedures[keep]
+            )
+
+    def search(
+        self,
+        query_embedding: Any,
+        n_results: int,
+        specialty: Optional[str] = None,
+        procedure_type: Optional[str] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the nearest embeddings to a query.
+
+        Args:
+            query_embedding: Query vector
+            n_results: Number of results to return
+            specialty: Only match reports with exactly this specialty
+            procedure_type: Only match reports with exactly this procedure type
+
+        Returns:
+            List of (id, cosine similarity) tuples, most similar first
+        """
+        ids, vectors, specialties, procedure_types = self._snapshot
+        if not ids or n_results <= 0:
+            return []
+
+        scores = vectors @ _normalize([query_embedding])[0]
+
+        # Score everything in one product, then keep only rows passing the filters
+        candidates = np.arange(len(ids))
+        if specialty or procedure_type:
+            mask = np.ones(len(ids), dtype=bool)
+            if specialty:
+                mask &= specialties == specialty
+            if procedure_type:
+                mask &= procedure_types == procedure_type
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+
+        k = min(n_results, len(candidates))
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
+
+
+def _quantize(vector: np.ndarray) -> bytes:
+    """
+    Pack an embedding as int8 values with a per-vector scale.
+
+    The blob is the float32 scale followed by one int8 per dimension
+    (388 bytes for 384 dimensions instead of 1536).
+    """
+    scale = float(np.abs(vector).max()) / 127 or 1.0
+    values = np.round(vector / scale).astype(np.int8)
+    return np.float32(scale).tobytes() + values.tobytes()
+
+
+def _dequantize(blob: bytes) -> np.ndarray:
+    """Unpack an embedding packed by _quantize() as float32."""
+    scale = np.frombuffer(blob, dtype=np.float32, count=1)[0]
+    return np.frombuffer(blob, dtype=np.int8, offset=4).astype(np.float32) * scale
+
+
+def _normalize(embeddings: Any) -> np.ndarray:
+    """Return embeddings as a float32 matrix with unit-length rows."""
+    vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
 
 class RAGEngine:
     def __init__(self):
         """Initialize the RAG engine with ChromaDB and sentence-transformers."""
-        # Initialize embedding model
-        self.embedding_model = SentenceTransformer(EMBEDDING_MODEL)
+        # Embedding model is loaded once per process and shared
+        self.embedding_model = get_embedding_model()
 
         # Initialize ChromaDB with persistent storage
         self.client = chromadb.PersistentClient(path=CHROMA_PERSIST_DIR)
@@ -28,6 +261,46 @@ class RAGEngine:
             metadata={"description": "Medical transcription reports"}
         )
 
+        # Exact in-memory index over the collection and the _indexed_key() of
+        # each indexed report, loaded on first use. The lock keeps both in
+        # step with the collection across writers.
+        self._flat_index: Optional[FlatIndex] = None
+        self._indexed_keys: Dict[str, str] = {}
+        self._index_lock = threading.Lock()
+
+        # Sentence embeddings of long context reports, keyed by report text
+        self._sentence_cache = LRUCache(maxsize=256)
+
+    def _get_flat_index(self) -> FlatIndex:
+        """Get the in-memory search index, loading it from the collection on first use."""
+        with self._index_lock:
+            if self._flat_index is None:
+                index = FlatIndex(self.embedding_model.get_sentence_embedding_dimension())
+                stored = self.collection.get(include=["embeddings", "metadatas"])
+                if len(stored['ids']):
+                    index.add(stored['ids'], stored['embeddings'], stored['metadatas'])
+                # Reports indexed before keys were recorded have none and are
+                # simply re-embedded if added again
+                self._indexed_keys = {
+                    id_: _indexed_key(
+                        metadata["embedding_key"], metadata.get("procedure_type"), metadata.get("specialty")
+                    )
+                    for id_, metadata in zip(stored['ids'], stored['metadatas'])
+                    if metadata and "embedding_key" in metadata
+                }
+                self._flat_index = index
+            return self._flat_index
+
+    def warm_up(self) -> None:
+        """
+        Prepare for searches so the first real one doesn't pay cold-start costs.
+
+        Loads the in-memory index from the collection, and runs one encode
+        so the embedding model initializes its kernels.
+        """
+        self.embedding_model.encode("operative report", show_progress_bar=False)
+        self._get_flat_index()
+
     def add_report(
         self,
         report_id: int,
@@ -44,20 +317,134 @@ class RAGEngine:
             procedure_type: Type of procedure
             specialty: Medical specialty
         """
-        # Generate embedding
-        embedding = self.embedding_model.encode(report_text).tolist()
-
-        # Add to collection
-        self.collection.add(
-            ids=[str(report_id)],
-            embeddings=[embedding],
-            documents=[report_text],
-            metadatas=[{
+        self.add_reports_batch([report_id], [report_text], [procedure_type], [specialty])
+
+    def add_reports_batch(
+        self,
+        report_ids: List[int],
+        report_texts: List[str],
+        procedure_types: List[str],
+        specialties: List[str],
+        batch_size: int = 32,
+        stored_embeddings: Optional[Dict[int, Tuple[str, bytes]]] = None
+    ) -> None:
+        """
+        Add several reports with one batched embedding pass and one collection upsert.
+
+        Reports already indexed with the same text and metadata are skipped;
+        reports whose text or metadata changed replace their old entry, and
+        only changed texts are re-embedded.
+
+        Args:
+            report_ids: Unique identifiers for the reports
+            report_texts: Full texts of the medical reports
+            procedure_types: Procedure type for each report
+            specialties: Medical specialty for each report
+            batch_size: Encoder batch size for the embedding model
+            stored_embeddings: Persisted embeddings from get_report_embeddings()
+                to reuse where the report text is unchanged
+        """
+        if not report_ids:
+            return
+
+        # Drop reports that are already indexed with identical text and metadata
+        self._get_flat_index()
+        keys = [_embedding_key(text) for text in report_texts]
+        indexed_keys = [
+            _indexed_key(key, procedure_type, specialty)
+            for key, procedure_type, specialty in zip(keys, procedure_types, specialties)
+        ]
+        with self._index_lock:
+            pending = [
+                i for i, (report_id, indexed_key) in enumerate(zip(report_ids, indexed_keys))
+                if self._indexed_keys.get(str(report_id)) != indexed_key
+            ]
+        if not pending:
+            return
+        if len(pending) < len(report_ids):
+            report_ids, report_texts, procedure_types, specialties, keys, indexed_keys = (
+                [column[i] for i in pending]
+                for column in (report_ids, report_texts, procedure_types, specialties, keys, indexed_keys)
+            )
+
+        embeddings = self._embed_reports(report_ids, report_texts, keys, batch_size, stored_embeddings)
+        ids = [str(report_id) for report_id in report_ids]
+
+        metadatas = [
+            {
                 "procedure_type": procedure_type,
                 "specialty": specialty,
-                "report_id": report_id
-            }]
-        )
+                "report_id": report_id,
+                "embedding_key": key
+            }
+            for report_id, procedure_type, specialty, key
+            in zip(report_ids, procedure_types, specialties, keys)
+        ]
+
+        # Upsert into the collection and the in-memory index. The float32
+        # matrix is passed as-is rather than boxed into lists of Python floats.
+        with self._index_lock:
+            self.collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                documents=list(report_texts),
+                metadatas=metadatas
+            )
+            if self._flat_index is not None:
+                self._flat_index.add(ids, embeddings, metadatas)
+            self._indexed_keys.update(zip(ids, indexed_keys))
+
+    def _embed_reports(
+        self,
+        report_ids: List[int],
+        report_texts: List[str],
+        keys: List[str],
+        batch_size: int = 32,
+        stored_embeddings: Optional[Dict[int, Tuple[str, bytes]]] = None
+    ) -> np.ndarray:
+        """
+        Embed report texts, reusing embeddings persisted in SQLite.
+
+        A stored embedding is reused when its hash matches the report's
+        current text and embedding model. Everything else is encoded in one
+        batched forward pass and written back to SQLite.
+
+        Args:
+            report_ids: Unique identifiers for the reports
+            report_texts: Full texts of the medical reports
+            keys: _embedding_key() of each report text
+            batch_size: Encoder batch size for the embedding model
+            stored_embeddings: report_id -> (text_hash, embedding bytes)
+
+        Returns:
+            float32 array with one embedding row per report
+        """
+        stored_embeddings = stored_embeddings or {}
+        dimension = self.embedding_model.get_sentence_embedding_dimension()
+        embeddings = np.empty((len(report_ids), dimension), dtype=np.float32)
+
+        missing = []
+        for i, (report_id, key) in enumerate(zip(report_ids, keys)):
+            stored = stored_embeddings.get(report_id)
+            if stored is not None and stored[0] == key:
+                embeddings[i] = _dequantize(stored[1])
+            else:
+                missing.append(i)
+
+        if missing:
+            # Only the head of each report is embedded; ChromaDB still stores
+            # the full text as the document
+            embeddings[missing] = self.embedding_model.encode(
+                [report_texts[i][:EMBED_MAX_CHARS] for i in missing],
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            save_report_embeddings(
+                (report_ids[i], keys[i], _quantize(embeddings[i])) for i in missing
+            )
+
+        return embeddings
 
     def add_single_report(
         self,
@@ -89,7 +476,11 @@ class RAGEngine:
             True if deletion was attempted
         """
         try:
-            self.collection.delete(ids=[str(report_id)])
+            with self._index_lock:
+                self.collection.delete(ids=[str(report_id)])
+                if self._flat_index is not None:
+                    self._flat_index.remove([str(report_id)])
+                self._indexed_keys.pop(str(report_id), None)
             return True
         except Exception:
             return False
@@ -113,41 +504,60 @@ class RAGEngine:
         Returns:
             List of matching report texts
         """
-        # Generate query embedding
-        query_embedding = self.embedding_model.encode(query).tolist()
-
-        # Build where filter if specified
-        where_filter = None
-        if specialty_filter or procedure_filter:
-            conditions = []
-            if specialty_filter:
-                conditions.append({"specialty": specialty_filter})
-            if procedure_filter:
-                conditions.append({"procedure_type": procedure_filter})
-
-            if len(conditions) == 1:
-                where_filter = conditions[0]
-            else:
-                where_filter = {"$and": conditions}
-
-        # Query collection
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results,
-            where=where_filter,
-            include=["documents", "metadatas", "distances"]
-        )
+        results = self.search_similar_scored(query, n_results, specialty_filter, procedure_filter)
+        return [document for document, _, _ in results]
+
+    def search_similar_scored(
+        self,
+        query: str,
+        n_results: int = 3,
+        specialty_filter: Optional[str] = None,
+        procedure_filter: Optional[str] = None
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Search for similar reports, keeping each match's distance and metadata.
 
-        # Return documents
-        if results and results['documents']:
-            return results['documents'][0]
-        return []
+        Args:
+            query: Search query text
+            n_results: Number of results to return
+            specialty_filter: Optional filter by specialty
+            procedure_filter: Optional filter by procedure type
+
+        Returns:
+            List of (report text, cosine distance, metadata) tuples, closest
+            first. Distance is 1 - cosine similarity: 0 for identical
+            direction, 1 for unrelated.
+        """
+        # Generate query embedding (cached per query text)
+        query_embedding = _embed_query(query)
+
+        # Rank (and filter) with the exact in-memory index; ChromaDB only
+        # serves the matching documents
+        hits = self._get_flat_index().search(
+            query_embedding, n_results, specialty=specialty_filter, procedure_type=procedure_filter
+        )
+        if not hits:
+            return []
+
+        hit_ids = [hit_id for hit_id, _ in hits]
+        fetched = self.collection.get(ids=hit_ids, include=["documents", "metadatas"])
+        found = {
+            fetched_id: (document, metadata)
+            for fetched_id, document, metadata
+            in zip(fetched['ids'], fetched['documents'], fetched['metadatas'])
+        }
+        return [
+            (found[hit_id][0], max(0.0, 1.0 - similarity), found[hit_id][1])
+            for hit_id, similarity in hits
+            if hit_id in found
+        ]
 
     def get_relevant_context(
         self,
         procedure_type: str,
         findings: str,
-        n_results: int = 3
+        n_results: int = 3,
+        max_distance: float = CONTEXT_MAX_DISTANCE
     ) -> str:
         """
         Get formatted context string for report generation.
@@ -156,6 +566,7 @@ class RAGEngine:
             procedure_type: Type of procedure being documented
             findings: Clinical findings to match against
             n_results: Number of similar reports to include
+            max_distance: Cosine distance above which a match is left out
 
         Returns:
             Formatted context string with similar reports
@@ -163,8 +574,13 @@ class RAGEngine:
         # Combine procedure type and findings for search
         query = f"{procedure_type}: {findings}"
 
-        # Search for similar reports
-        similar_reports = self.search_similar(query, n_results=n_results)
+        # Search for similar reports, dropping matches too distant to help;
+        # they would only spend LLM input tokens
+        similar_reports = [
+            report
+            for report, distance, _ in self.search_similar_scored(query, n_results=n_results)
+            if distance <= max_distance
+        ]
 
         if not similar_reports:
             return "No similar reports found in the database."
@@ -174,15 +590,125 @@ class RAGEngine:
             "=== SIMILAR MEDICAL REPORTS FOR REFERENCE ===\n"
         ]
 
+        # Condense long reports to their most relevant sentences
+        similar_reports = self._condense_reports(similar_reports, query, CONTEXT_REPORT_CHARS)
+
         for i, report in enumerate(similar_reports, 1):
-            # Truncate very long reports for context
-            truncated = report[:3000] + "..." if len(report) > 3000 else report
-            context_parts.append(f"--- Example Report {i} ---\n{truncated}\n")
+            context_parts.append(f"--- Example Report {i} ---\n{report}\n")
 
         context_parts.append("=== END OF REFERENCE REPORTS ===")
 
         return "\n".join(context_parts)
 
+    def _condense_reports(self, reports: List[str], query: str, max_chars: int) -> List[str]:
+        """
+        Shorten reports longer than max_chars to the sentences most relevant to a query.
+
+        Reports are split into sentences and lines. Section headings are kept
+        first so the report still shows its structure; the remaining
+        sentences are ranked by cosine similarity to the query and taken best
+        first while they fit in max_chars. Kept text stays in its original
+        order and spacing. A report whose headings alone exceed max_chars is
+        truncated instead. Sentences of every uncached report are embedded in
+        one batched encode() call.
+
+        Args:
+            reports: Report texts
+            query: Query the sentences are ranked against
+            max_chars: Character budget per report
+
+        Returns:
+            The reports, with long ones condensed, in input order
+        """
+        long_reports = [report for report in dict.fromkeys(reports) if len(report) > max_chars]
+        if not long_reports:
+            return reports
+
+        # [sentence, whitespace, sentence, whitespace, ..., sentence]
+        pieces = {report: SENTENCE_BOUNDARY.split(report) for report in long_reports}
+        vectors = {}
+        uncached = []
+        for report in long_reports:
+            cached = self._sentence_cache.get(hash_key(EMBEDDING_MODEL, report))
+            if cached is not None:
+                vectors[report] = cached
+            else:
+                uncached.append(report)
+
+        if uncached:
+            sentences = [sentence[:EMBED_MAX_CHARS] for report in uncached for sentence in pieces[report][::2]]
+            encoded = _normalize(self.embedding_model.encode(
+                sentences,
+                batch_size=64,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            ))
+            offset = 0
+            for report in uncached:
+                count = len(pieces[report][::2])
+                vectors[report] = encoded[offset:offset + count]
+                self._sentence_cache.set(hash_key(EMBEDDING_MODEL, report), vectors[report])
+                offset += count
+
+        query_vector = _normalize([_embed_query(query)])[0]
+        condensed = {}
+        for report in long_reports:
+            sentences = pieces[report][::2]
+            # Each sentence keeps the whitespace that followed it
+            spacing = pieces[report][1::2] + [""]
+            scores = vectors[report] @ query_vector
+
+            # Headings first, within the budget: bare headings in order, then
+            # short heading lines in full
+            kept = {}
+            used = 0
+            headings = [(index, SECTION_HEADING.match(sentence)) for index, sentence in enumerate(sentences)]
+            headings = [(index, heading.group(0)) for index, heading in headings if heading]
+            for index, heading in headings:
+                length = len(heading) + len(spacing[index])
+                if used + length > max_chars:
+                    break
+                kept[index] = heading
+                used += length
+            else:
+                for index, heading in headings:
+                    extra = len(sentences[index]) - len(heading)
+                    if len(sentences[index]) <= HEADING_LINE_CHARS and used + extra <= max_chars:
+                        kept[index] = sentences[index]
+                        used += extra
+
+            if len(kept) < len(headings):
+                # The headings alone exceed the budget (e.g. an all-caps note)
+                condensed[report] = report[:max_chars] + "..."
+                continue
+
+            for index in np.argsort(-scores):
+                current = kept.get(index)
+                if current == sentences[index]:
+                    continue
+                extra = len(sentences[index]) + len(spacing[index])
+                if current is not None:
+                    # Expanding a bare heading to its full sentence
+                    extra -= len(current) + len(spacing[index])
+                if used + extra <= max_chars:
+                    kept[index] = sentences[index]
+                    used += extra
+
+            if kept:
+                # Join kept text, keeping a line break if any dropped text had
+                # one; that can lengthen a gap, so cap the result
+                parts = []
+                order = sorted(kept)
+                for index, next_index in zip(order, order[1:] + [len(sentences)]):
+                    gaps = spacing[index:next_index]
+                    parts.append(kept[index] + next((gap for gap in gaps if "\n" in gap), gaps[0]))
+                condensed[report] = "".join(parts).rstrip()[:max_chars]
+            else:
+                # No sentence fits on its own (e.g. unpunctuated text)
+                condensed[report] = report[:max_chars] + "..."
+
+        return [condensed.get(report, report) for report in reports]
+
     def rebuild_from_db(self) -> Dict[str, int]:
         """
         Rebuild the ChromaDB collection from all reports in the SQLite database.
@@ -202,29 +728,22 @@ class RAGEngine:
             name=COLLECTION_NAME,
             metadata={"description": "Medical transcription reports"}
         )
+        with self._index_lock:
+            self._flat_index = FlatIndex(self.embedding_model.get_sentence_embedding_dimension())
+            self._indexed_keys = {}
 
-        # Get all reports from database
-        reports = get_all_reports(limit=10000)
-        total = len(reports)
-        print(f"Found {total} reports in database")
-
-        # Track statistics
+        # Collect reports with text from the database
         stats = {
-            "total_reports": total,
+            "total_reports": 0,
             "indexed": 0,
             "skipped": 0,
             "specialties": {},
             "procedure_types": {}
         }
+        reports = []
 
-        # Process in batches for efficiency
-        batch_size = 100
-        batch_ids = []
-        batch_embeddings = []
-        batch_documents = []
-        batch_metadatas = []
-
-        for i, report in enumerate(reports):
+        for report in iter_reports(limit=10000):
+            stats["total_reports"] += 1
             report_text = report.get('report_text', '')
             if not report_text or not report_text.strip():
                 stats["skipped"] += 1
@@ -232,50 +751,31 @@ class RAGEngine:
 
             procedure_type = report.get('procedure_type', 'Unknown')
             specialty = report.get('specialty', 'Unknown')
+            reports.append((report['id'], report_text, procedure_type, specialty))
 
-            # Track stats
-            stats["specialties"][specialty] = stats["specialties"].get(specialty, 0) + 1
-            stats["procedure_types"][procedure_type] = stats["procedure_types"].get(procedure_type, 0) + 1
+        # Track stats
+        stats["specialties"] = dict(Counter(map(itemgetter(3), reports)))
+        stats["procedure_types"] = dict(Counter(map(itemgetter(2), reports)))
 
-            # Generate embedding
-            embedding = self.embedding_model.encode(report_text).tolist()
+        total = stats["total_reports"]
+        print(f"Found {total} reports in database")
 
-            # Add to batch
-            batch_ids.append(str(report['id']))
-            batch_embeddings.append(embedding)
-            batch_documents.append(report_text)
-            batch_metadatas.append({
-                "procedure_type": procedure_type,
-                "specialty": specialty,
-                "report_id": report['id']
-            })
-
-            # Insert batch when full
-            if len(batch_ids) >= batch_size:
-                self.collection.add(
-                    ids=batch_ids,
-                    embeddings=batch_embeddings,
-                    documents=batch_documents,
-                    metadatas=batch_metadatas
-                )
-                stats["indexed"] += len(batch_ids)
-                print(f"  Indexed {stats['indexed']}/{total} reports...")
-
-                # Clear batches
-                batch_ids = []
-                batch_embeddings = []
-                batch_documents = []
-                batch_metadatas = []
-
-        # Insert remaining batch
-        if batch_ids:
-            self.collection.add(
-                ids=batch_ids,
-                embeddings=batch_embeddings,
-                documents=batch_documents,
-                metadatas=batch_metadatas
+        # Reports whose text hasn't changed since they were last embedded
+        # reuse the embedding stored in SQLite
+        stored_embeddings = get_report_embeddings()
+
+        # Embed and insert in large batches; each batch is at most one encode()
+        # call and one collection insert
+        batch_size = 500
+        for start in range(0, len(reports), batch_size):
+            batch = reports[start:start + batch_size]
+            report_ids, report_texts, procedure_types, specialties = (list(col) for col in zip(*batch))
+            self.add_reports_batch(
+                report_ids, report_texts, procedure_types, specialties,
+                batch_size=64, stored_embeddings=stored_embeddings
             )
-            stats["indexed"] += len(batch_ids)
+            stats["indexed"] += len(batch)
+            print(f"  Indexed {stats['indexed']}/{total} reports...")
 
         print(f"Rebuild complete: {stats['indexed']} reports indexed")
         return stats
@@ -291,7 +791,122 @@ class RAGEngine:
         }
 
 
+# Process-wide engine shared by every caller that doesn't bring its own
+_shared_engine: Optional[RAGEngine] = None
+_shared_engine_lock = threading.Lock()
+
+
+def get_shared_rag_engine() -> RAGEngine:
+    """
+    Get the process-wide RAGEngine, creating it on first use.
+
+    Reuses one ChromaDB client and in-memory index instead of reopening
+    them for every ReportGenerator.
+    """
+    global _shared_engine
+    with _shared_engine_lock:
+        if _shared_engine is None:
+            _shared_engine = RAGEngine()
+        return _shared_engine
+
+
+class BatchIndexer:
+    """
+    Buffers new reports and indexes them in batches on a background thread.
+
+    Submitting returns immediately; the worker waits up to max_wait seconds
+    for more reports so the embedding model runs on batches instead of
+    single documents. Reports whose batch fails to index are kept so they
+    can be reported and retried.
+    """
+
+    def __init__(self, rag_engine: RAGEngine, batch_size: int = 32, max_wait: float = 0.2):
+        """
+        Initialize the indexer and start its worker thread.
+
+        Args:
+            rag_engine: RAGEngine to index reports into
+            batch_size: Maximum reports per batch
+            max_wait: Seconds to wait for a batch to fill after the first report
+        """
+        self.rag_engine = rag_engine
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._failed: Dict[int, Tuple[tuple, str]] = {}
+        self._failed_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(
+        self,
+        report_id: int,
+        report_text: str,
+        procedure_type: str,
+        specialty: str
+    ) -> None:
+        """Queue a report for indexing."""
+        self._queue.put((report_id, report_text, procedure_type, specialty))
+
+    def flush(self) -> None:
+        """Block until every submitted report has been indexed or has failed."""
+        self._queue.join()
+
+    def failed_reports(self) -> Dict[int, str]:
+        """Map of report ID to error message for reports that failed to index."""
+        with self._failed_lock:
+            return {report_id: error for report_id, (_, error) in self._failed.items()}
+
+    def retry_failed(self) -> int:
+        """
+        Queue every failed report for indexing again.
+
+        Returns:
+            Number of reports queued
+        """
+        with self._failed_lock:
+            items = [item for item, _ in self._failed.values()]
+            self._failed.clear()
+        for item in items:
+            self._queue.put(item)
+        return len(items)
+
+    def forget(self, report_id: int) -> None:
+        """Drop a failed report so it is not retried (e.g. after deletion)."""
+        with self._failed_lock:
+            self._failed.pop(report_id, None)
+
+    def _run(self) -> None:
+        """Worker loop: collect a batch, index it, repeat."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            report_ids, report_texts, procedure_types, specialties = (list(col) for col in zip(*batch))
+            try:
+                self.rag_engine.add_reports_batch(report_ids, report_texts, procedure_types, specialties)
+            except Exception as e:
+                print(f"Warning: failed to index reports {report_ids} - {str(e)}")
+                with self._failed_lock:
+                    for item in batch:
+                        self._failed[item[0]] = (item, str(e))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
 if __name__ == "__main__":
+    # Creates the report_embeddings table in databases that predate it
+    init_db()
+
     print("Initializing RAG Engine...")
     engine = RAGEngine()
 
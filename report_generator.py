@@ -2,30 +2,96 @@
 Report Generator - AI-powered operative report generation using RAG and Ollama.
 """
 
-from typing import Optional, Dict, Any, List
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Iterator, Union
 import ollama
-from rag_engine import RAGEngine
+from lru_cache import LRUCache, hash_key
+from rag_engine import RAGEngine, get_shared_rag_engine
 
 # Default model for generation
 DEFAULT_MODEL = "qwen2.5:32b"
 
+# Keep the model loaded in Ollama indefinitely to avoid cold-load stalls
+KEEP_ALIVE = -1
+
+# Context window for generation. Fixed so Ollama never reloads the model to
+# resize it, and large enough for the prompt with three reference reports
+# (~3k tokens) plus the 4096-token report.
+DEFAULT_NUM_CTX = 8192
+
+# System prompt for report generation. It never depends on the inputs, so
+# every request starts with the same prefix.
+SYSTEM_PROMPT = """You are an expert medical transcriptionist specializing in operative reports.
+Your task is to generate a complete, professional operative report based on the surgeon's inputs.
+
+CRITICAL REQUIREMENTS:
+1. Use proper medical terminology throughout
+2. Maintain a professional, formal tone appropriate for medical records
+3. DO NOT use any placeholders, brackets, or fill-in-the-blank text (e.g., no [DATE], [TIME], etc.)
+4. Generate complete sentences and paragraphs
+5. Follow standard operative report structure and formatting
+6. Include all provided information naturally in the report
+7. If a field is marked "None" or empty, either omit it or state appropriately (e.g., "No drains were placed")
+
+The report should include these sections in order:
+- PREOPERATIVE DIAGNOSIS
+- POSTOPERATIVE DIAGNOSIS
+- PROCEDURE PERFORMED
+- SURGEON / ASSISTANT
+- ANESTHESIA
+- INDICATIONS
+- FINDINGS
+- PROCEDURE IN DETAIL
+- SPECIMENS
+- DRAINS
+- ESTIMATED BLOOD LOSS
+- COMPLICATIONS
+- DISPOSITION (patient condition at end)"""
+
+# Completions are cached in memory only: the prompt holds surgeon inputs
+# that were never de-identified, so they must not reach reports.db.
+# Entries expire so a long-running app does not serve stale drafts.
+COMPLETION_CACHE_SIZE = 128
+COMPLETION_CACHE_TTL = 60 * 60
+
+# Reports generated at once by generate_many. Ollama decodes concurrent
+# requests together when started with OLLAMA_NUM_PARALLEL >= this.
+GENERATION_CONCURRENCY = 4
+
 
 class ReportGenerator:
     """
     Generates operative reports using RAG context and LLM generation.
     """
 
-    def __init__(self, rag_engine: Optional[RAGEngine] = None, model: str = DEFAULT_MODEL):
+    def __init__(
+        self,
+        rag_engine: Optional[RAGEngine] = None,
+        model: str = DEFAULT_MODEL,
+        num_ctx: int = DEFAULT_NUM_CTX,
+        keep_alive: Union[int, str] = KEEP_ALIVE
+    ):
         """
         Initialize the report generator.
 
         Args:
             rag_engine: RAGEngine instance for retrieving similar reports.
-                        If None, a new instance will be created.
+                        If None, the process-wide shared engine is used.
             model: Ollama model to use for generation (default: qwen2.5:32b)
+            num_ctx: Context window in tokens (default: 8192)
+            keep_alive: How long Ollama keeps the model loaded after a request,
+                        e.g. "30m"; -1 keeps it loaded indefinitely (default)
         """
-        self.rag_engine = rag_engine or RAGEngine()
+        self.rag_engine = rag_engine or get_shared_rag_engine()
         self.model = model
+        self.num_ctx = num_ctx
+        self.keep_alive = keep_alive
+        # One persistent HTTP client for all requests to the Ollama server
+        self._client = ollama.Client()
+        self._completion_cache = LRUCache(
+            maxsize=COMPLETION_CACHE_SIZE, ttl=COMPLETION_CACHE_TTL
+        )
 
     def _call_llm(self, messages: List[Dict[str, str]]) -> str:
         """
@@ -41,20 +107,79 @@ class ReportGenerator:
             Generated text from the LLM
         """
         try:
-            response = ollama.chat(
+            # Streamed so tokens are read as they are produced, then joined
+            stream = self._client.chat(
                 model=self.model,
                 messages=messages,
-                options={
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "num_predict": 4096,
-                }
+                options=self._llm_options(),
+                keep_alive=self.keep_alive,
+                stream=True
             )
-            return response['message']['content']
+            return "".join(chunk['message']['content'] for chunk in stream)
         except Exception as e:
             return f"Error: LLM generation failed - {str(e)}"
 
-    def generate_report(
+    def _stream_llm(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """
+        Stream the LLM response for the given messages.
+
+        Streaming counterpart of _call_llm; swap both together.
+
+        Args:
+            messages: List of message dicts with 'role' and 'content' keys
+
+        Yields:
+            Text chunks as they are produced by the LLM
+        """
+        try:
+            for chunk in self._client.chat(
+                model=self.model,
+                messages=messages,
+                options=self._llm_options(),
+                keep_alive=self.keep_alive,
+                stream=True
+            ):
+                yield chunk['message']['content']
+        except Exception as e:
+            yield f"Error: LLM generation failed - {str(e)}"
+
+    def warm_up(self) -> None:
+        """Load the model into Ollama ahead of the first request."""
+        try:
+            # Load with the same context size as real requests, or the first
+            # request would reload the model
+            self._client.generate(
+                model=self.model,
+                prompt="",
+                options={"num_ctx": self.num_ctx},
+                keep_alive=self.keep_alive
+            )
+        except Exception as e:
+            print(f"Warning: could not preload {self.model} - {str(e)}")
+
+    def _llm_options(self) -> Dict[str, Any]:
+        """Sampling options shared by _call_llm and _stream_llm."""
+        return {
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "num_predict": 4096,
+            "num_ctx": self.num_ctx,
+        }
+
+    def _cache_key(self, messages: List[Dict[str, str]]) -> str:
+        """
+        Key for the completion cache: the model, sampling options and full prompt.
+
+        The prompt includes the retrieved reference reports, so adding
+        reports that change the context also changes the key.
+        """
+        return hash_key(
+            self.model,
+            json.dumps(self._llm_options(), sort_keys=True),
+            json.dumps(messages)
+        )
+
+    def _build_messages(
         self,
         procedure_type: str,
         preop_diagnosis: str,
@@ -70,9 +195,9 @@ class ReportGenerator:
         ebl: str = "Minimal",
         complications: str = "None",
         n_context_reports: int = 3
-    ) -> str:
+    ) -> List[Dict[str, str]]:
         """
-        Generate a complete operative report based on surgeon inputs.
+        Build the chat messages for a report generation request.
 
         Args:
             procedure_type: Type of procedure (e.g., "Laparoscopic Cholecystectomy")
@@ -91,7 +216,7 @@ class ReportGenerator:
             n_context_reports: Number of similar reports to retrieve for context
 
         Returns:
-            Generated operative report text
+            List of message dicts with 'role' and 'content' keys
         """
         # Get relevant context from RAG
         context = self.rag_engine.get_relevant_context(
@@ -100,34 +225,6 @@ class ReportGenerator:
             n_results=n_context_reports
         )
 
-        # Build the system prompt
-        system_prompt = """You are an expert medical transcriptionist specializing in operative reports.
-Your task is to generate a complete, professional operative report based on the surgeon's inputs.
-
-CRITICAL REQUIREMENTS:
-1. Use proper medical terminology throughout
-2. Maintain a professional, formal tone appropriate for medical records
-3. DO NOT use any placeholders, brackets, or fill-in-the-blank text (e.g., no [DATE], [TIME], etc.)
-4. Generate complete sentences and paragraphs
-5. Follow standard operative report structure and formatting
-6. Include all provided information naturally in the report
-7. If a field is marked "None" or empty, either omit it or state appropriately (e.g., "No drains were placed")
-
-The report should include these sections in order:
-- PREOPERATIVE DIAGNOSIS
-- POSTOPERATIVE DIAGNOSIS
-- PROCEDURE PERFORMED
-- SURGEON / ASSISTANT
-- ANESTHESIA
-- INDICATIONS
-- FINDINGS
-- PROCEDURE IN DETAIL
-- SPECIMENS
-- DRAINS
-- ESTIMATED BLOOD LOSS
-- COMPLICATIONS
-- DISPOSITION (patient condition at end)"""
-
         # Build the user prompt with surgeon inputs
         user_prompt = f"""Generate an operative report using the following information:
 
@@ -151,13 +248,136 @@ SURGEON INPUTS:
 Based on the surgeon inputs above and using the reference reports for formatting and structure guidance, generate a complete operative report. Write the full report now:"""
 
         # Build messages for LLM
-        messages = [
-            {"role": "system", "content": system_prompt},
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": user_prompt}
         ]
 
-        # Generate the report
-        return self._call_llm(messages)
+    def generate_report(
+        self,
+        procedure_type: str,
+        preop_diagnosis: str,
+        postop_diagnosis: str,
+        surgeon_name: str,
+        assistant: str = "",
+        anesthesia_type: str = "General",
+        indications: str = "",
+        findings: str = "",
+        procedure_details: str = "",
+        specimens: str = "None",
+        drains: str = "None",
+        ebl: str = "Minimal",
+        complications: str = "None",
+        n_context_reports: int = 3,
+        *,
+        force_refresh: bool = False
+    ) -> str:
+        """
+        Generate a complete operative report based on surgeon inputs.
+
+        A report generated recently from the identical prompt is returned
+        from the in-memory cache instead of calling the LLM again.
+
+        Args:
+            procedure_type: Type of procedure (e.g., "Laparoscopic Cholecystectomy")
+            preop_diagnosis: Preoperative diagnosis
+            postop_diagnosis: Postoperative diagnosis
+            surgeon_name: Name of the operating surgeon
+            assistant: Name of assistant surgeon (optional)
+            anesthesia_type: Type of anesthesia used
+            indications: Indications for the procedure
+            findings: Intraoperative findings
+            procedure_details: Key details about the procedure performed
+            specimens: Specimens sent to pathology
+            drains: Drains placed
+            ebl: Estimated blood loss
+            complications: Any complications encountered
+            n_context_reports: Number of similar reports to retrieve for context
+            force_refresh: Generate a new report even if one is cached
+
+        Returns:
+            Generated operative report text
+        """
+        messages = self._build_messages(
+            procedure_type, preop_diagnosis, postop_diagnosis, surgeon_name,
+            assistant, anesthesia_type, indications, findings, procedure_details,
+            specimens, drains, ebl, complications, n_context_reports
+        )
+        cache_key = self._cache_key(messages)
+        if not force_refresh:
+            cached = self._completion_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        report = self._call_llm(messages)
+        if not report.startswith("Error:"):
+            self._completion_cache.set(cache_key, report)
+        return report
+
+    def generate_report_stream(
+        self,
+        procedure_type: str,
+        preop_diagnosis: str,
+        postop_diagnosis: str,
+        surgeon_name: str,
+        assistant: str = "",
+        anesthesia_type: str = "General",
+        indications: str = "",
+        findings: str = "",
+        procedure_details: str = "",
+        specimens: str = "None",
+        drains: str = "None",
+        ebl: str = "Minimal",
+        complications: str = "None",
+        n_context_reports: int = 3,
+        *,
+        force_refresh: bool = False
+    ) -> Iterator[str]:
+        """
+        Generate an operative report, yielding the accumulated text as it streams.
+
+        A recently cached report for the identical prompt is yielded whole
+        instead of being regenerated.
+
+        Args:
+            procedure_type: Type of procedure (e.g., "Laparoscopic Cholecystectomy")
+            preop_diagnosis: Preoperative diagnosis
+            postop_diagnosis: Postoperative diagnosis
+            surgeon_name: Name of the operating surgeon
+            assistant: Name of assistant surgeon (optional)
+            anesthesia_type: Type of anesthesia used
+            indications: Indications for the procedure
+            findings: Intraoperative findings
+            procedure_details: Key details about the procedure performed
+            specimens: Specimens sent to pathology
+            drains: Drains placed
+            ebl: Estimated blood loss
+            complications: Any complications encountered
+            n_context_reports: Number of similar reports to retrieve for context
+            force_refresh: Generate a new report even if one is cached
+
+        Yields:
+            The report text generated so far
+        """
+        messages = self._build_messages(
+            procedure_type, preop_diagnosis, postop_diagnosis, surgeon_name,
+            assistant, anesthesia_type, indications, findings, procedure_details,
+            specimens, drains, ebl, complications, n_context_reports
+        )
+        cache_key = self._cache_key(messages)
+        if not force_refresh:
+            cached = self._completion_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        report = ""
+        for chunk in self._stream_llm(messages):
+            report += chunk
+            yield report
+
+        if report and "Error: LLM generation failed" not in report:
+            self._completion_cache.set(cache_key, report)
 
     def generate_report_from_dict(self, inputs: Dict[str, Any]) -> str:
         """
@@ -188,13 +408,38 @@ Based on the surgeon inputs above and using the reference reports for formatting
             n_context_reports=inputs.get('n_context_reports', 3)
         )
 
+    def generate_many(
+        self,
+        inputs_list: List[Dict[str, Any]],
+        concurrency: int = GENERATION_CONCURRENCY
+    ) -> List[str]:
+        """
+        Generate several reports concurrently.
+
+        Each report runs generate_report_from_dict on a worker thread, so up
+        to `concurrency` requests are in flight at the Ollama server instead
+        of one at a time.
+
+        Args:
+            inputs_list: Dictionaries of report inputs
+            concurrency: Maximum number of reports generated at once
+
+        Returns:
+            Generated operative report texts (or error messages), in input order
+        """
+        if not inputs_list:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(inputs_list))) as executor:
+            return list(executor.map(self.generate_report_from_dict, inputs_list))
+
 
 if __name__ == "__main__":
     print("Report Generator - Test")
     print("=" * 60)
 
     print("\nInitializing RAG Engine...")
-    rag_engine = RAGEngine()
+    rag_engine = get_shared_rag_engine()
 
     print("Initializing Report Generator...")
     generator = ReportGenerator(rag_engine=rag_engine)